@@ -0,0 +1,335 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Collection, Dict, Iterable, Optional, Tuple
+
+from background import ensure_running
+from fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def api_key_digest(api_key: bytes) -> str:
+    # Only a digest is kept in memory and in Mongo
+    return hashlib.sha1(api_key).hexdigest()
+
+
+def client_key(scope, trusted_proxies: int = 0, api_keys: Collection[str] = (), api_key_header: str = "x-api-key") -> str:
+    """Who a request is charged to: its API key when it is an issued one, else the client IP.
+
+    ``api_keys`` holds the digests of issued keys; any other key is ignored, so
+    making keys up does not buy fresh buckets. X-Forwarded-For is only read when
+    ``trusted_proxies`` proxies sit in front of the app, and then only the hop the
+    outermost of them appended: entries left of it are whatever the client sent.
+    """
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(api_key_header.encode("latin-1"))
+    if api_key and api_keys:
+        digest = api_key_digest(api_key)
+        if digest in api_keys:
+            return "key:" + digest[:16]
+    if trusted_proxies > 0:
+        hops = [hop.strip() for hop in headers.get(b"x-forwarded-for", b"").decode("latin-1").split(",") if hop.strip()]
+        if hops:
+            return "ip:" + hops[-min(trusted_proxies, len(hops))]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "window", "own", "others_seen")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        # Shared mode only: usage in the current window, ours and other workers'
+        self.window = 0
+        self.own = 0.0
+        self.others_seen = 0.0
+
+
+class AdmissionController:
+    """Per-client token buckets plus a global in-flight budget for expensive requests.
+
+    Each client gets ``rate`` tokens per second up to ``burst``; a request costs
+    as many tokens as LLM calls it may make (capped at ``burst`` so a large batch
+    can still get in). At most ``max_in_flight`` admitted requests run at once in
+    this process, since that budget protects this process's memory and LLM pool.
+    A zero ``rate`` or ``max_in_flight`` turns that check off.
+
+    Buckets live in a bounded in-process LRU. With a ``shared`` Mongo collection,
+    a background task pushes each active client's consumption into a per-window
+    counter every ``sync_interval`` seconds and debits local buckets with what
+    other workers spent, so limits hold across workers to within one interval
+    without a database round trip on the request path.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 10,
+        max_in_flight: int = 40,
+        overload_retry_after: float = 2,
+        max_clients: int = 10000,
+        shared=None,
+        sync_interval: float = 1.0,
+        window: float = 60,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.overload_retry_after = overload_retry_after
+        self.max_clients = max_clients
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self.window = window
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.in_flight = 0
+        self._pending: Dict[str, float] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+        self.admitted = 0
+        self.passed = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self.syncs = 0
+        self.sync_failures = 0
+
+    async def ensure_indexes(self) -> None:
+        if self.shared is not None:
+            await self.shared.create_index("expires_at", expireAfterSeconds=0)
+
+    def start(self) -> None:
+        if self.shared is not None:
+            self._sync_task = ensure_running(self._sync_task, self._sync_loop)
+
+    async def stop(self) -> None:
+        if self._sync_task is not None and not self._sync_task.done():
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+        self._sync_task = None
+        if self.shared is not None and self._pending:
+            await self.sync()
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.burst, now)
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def shed(self) -> Optional[Tuple[int, int, str]]:
+        """A 503 rejection while the in-flight budget is used up, else None."""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.overloaded += 1
+            return 503, max(1, math.ceil(self.overload_retry_after)), "Recommendation service is busy, please retry shortly"
+        return None
+
+    def _over_limit(self, bucket: TokenBucket, cost: float) -> Optional[Tuple[int, int, str]]:
+        if bucket.tokens >= cost:
+            return None
+        self.rate_limited += 1
+        return 429, max(1, math.ceil((cost - bucket.tokens) / self.rate)), "Too many requests, please retry later"
+
+    def throttle(self, client: str) -> Optional[Tuple[int, int, str]]:
+        """A 429 rejection when ``client`` cannot afford even one call, else None.
+
+        Cheap enough to run before a request is priced, so clients already over
+        their limit are turned away without any cache lookups.
+        """
+        if self.rate <= 0:
+            return None
+        return self._over_limit(self._bucket(client, time.monotonic()), min(1, self.burst))
+
+    def admit(self, client: str, cost: float = 1) -> Optional[Tuple[int, int, str]]:
+        """None when admitted (call ``release`` afterwards), else (status, retry_after_seconds, detail)."""
+        rejection = self.shed()
+        if rejection is not None:
+            return rejection
+        if self.rate > 0:
+            self.start()
+            cost = min(cost, self.burst)
+            bucket = self._bucket(client, time.monotonic())
+            rejection = self._over_limit(bucket, cost)
+            if rejection is not None:
+                return rejection
+            bucket.tokens -= cost
+            if self.shared is not None:
+                self._pending[client] = self._pending.get(client, 0.0) + cost
+        self.in_flight += 1
+        self.admitted += 1
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+    async def _sync_client(self, client: str, delta: float, window: int) -> None:
+        window_start = datetime.fromtimestamp(window * self.window, timezone.utc)
+        doc = await self.shared.find_one_and_update(
+            {"_id": f"{client}|{window}"},
+            {"$inc": {"used": delta}, "$setOnInsert": {"expires_at": window_start + timedelta(seconds=self.window * 2)}},
+            upsert=True,
+            return_document=True,
+        )
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            return
+        if bucket.window != window:
+            bucket.window, bucket.own, bucket.others_seen = window, 0.0, 0.0
+        bucket.own += delta
+        others = max(0.0, doc["used"] - bucket.own)
+        bucket.tokens -= others - bucket.others_seen
+        bucket.others_seen = others
+
+    async def sync(self) -> None:
+        """Exchange consumption with other workers for every client active since the last sync."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        window = int(time.time() // self.window)
+        results = await asyncio.gather(
+            *(self._sync_client(client, delta, window) for client, delta in pending.items()),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        self.syncs += 1
+        if failures:
+            self.sync_failures += 1
+            logger.warning(f"Sharing rate limit state failed for {len(failures)} clients: {str(failures[0])}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "clients": len(self.buckets),
+            "admitted": self.admitted,
+            "passed": self.passed,
+            "rate_limited": self.rate_limited,
+            "overloaded": self.overloaded,
+            "shared": self.shared is not None,
+            "syncs": self.syncs,
+            "sync_failures": self.sync_failures,
+        }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware that admits or sheds requests to expensive routes.
+
+    Only ``(method, path)`` pairs in ``routes`` are checked; everything else passes
+    untouched. While the in-flight budget is used up those are shed at once, before
+    anything else is done for them. Otherwise the body is read up front and, unless
+    the client's bucket is already empty, ``cost(scope, body)`` says how many LLM
+    calls the request may need: 0 (e.g. a cache hit) lets it through without
+    touching any budget. Rejections are answered with a JSON ``detail`` and a
+    Retry-After header, before the request reaches the app.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        routes: Iterable[Tuple[str, str]],
+        cost: Optional[Callable[[Dict[str, Any], bytes], Awaitable[float]]] = None,
+        trusted_proxies: int = 0,
+        api_keys: Iterable[str] = (),
+        max_body: int = 1048576,
+    ):
+        self.app = app
+        self.controller = controller
+        self.routes = set(routes)
+        self.cost = cost
+        self.trusted_proxies = trusted_proxies
+        self.api_keys = frozenset(api_key_digest(key.encode("latin-1")) for key in api_keys)
+        self.max_body = max_body
+
+    async def reject(self, send, rejection: Tuple[int, int, str]) -> None:
+        status, retry_after, detail = rejection
+        content = dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(content)).encode("latin-1")),
+                (b"retry-after", str(retry_after).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": content})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"].rstrip("/")) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        # Overload is answered before the body is read or the cost is looked up
+        rejection = self.controller.shed()
+        if rejection is not None:
+            await self.reject(send, rejection)
+            return
+
+        chunks, size, more_body = [], 0, True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away before sending the body
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        # A client that cannot afford a single call is refused before any pricing lookups
+        client = client_key(scope, self.trusted_proxies, self.api_keys)
+        rejection = self.controller.throttle(client)
+        if rejection is not None:
+            await self.reject(send, rejection)
+            return
+
+        cost = 1.0
+        if self.cost is not None and size <= self.max_body:
+            try:
+                cost = await self.cost(scope, body)
+            except Exception as e:
+                logger.warning(f"Admission cost check failed, charging one call: {str(e)}")
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        if cost <= 0:
+            self.controller.passed += 1
+            await self.app(scope, replay, send)
+            return
+
+        rejection = self.controller.admit(client, cost)
+        if rejection is not None:
+            await self.reject(send, rejection)
+            return
+
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            self.controller.release()
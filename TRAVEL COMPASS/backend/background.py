@@ -0,0 +1,13 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+
+def ensure_running(task: Optional[asyncio.Task], run: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    """``task`` while it is still running, else a new task for ``run()``.
+
+    Background workers call this from ``start`` and again on their hot path, so
+    they also run when the app is served without lifespan events.
+    """
+    if task is None or task.done():
+        task = asyncio.ensure_future(run())
+    return task
@@ -0,0 +1,135 @@
+"""Micro-benchmark: LLM output parsing and response serialization.
+
+Compares the previous parse path (json.loads, then a greedy regex and a second
+json.loads) with fast_json.extract_json, and the stdlib JSONResponse with
+FastJSONResponse, on a corpus shaped like real model output: clean JSON, fenced
+```json blocks, chatty preambles and postscripts, braces inside trailing prose
+and truncated responses.
+
+    python benchmarks/bench_json_extract.py [--repeat 2000]
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.responses import JSONResponse  # noqa: E402
+
+from fast_json import FastJSONResponse, extract_json, orjson  # noqa: E402
+
+CITIES = ["Kyoto, Japan", "Lisbon, Portugal", "Cusco, Peru", "Cape Town, South Africa", "Reykjavik, Iceland", "Hanoi, Vietnam"]
+TYPES = ["attraction", "restaurant", "activity", "accommodation"]
+
+
+def make_recommendation(rng: random.Random, destination: str) -> dict:
+    city = destination.split(",")[0]
+    return {
+        "recommendations": [
+            {
+                "name": f"{city} {rng.choice(['Old Town', 'Night Market', 'Harbour Walk', 'Food Hall', 'Viewpoint'])} {i}",
+                "type": rng.choice(TYPES),
+                "description": f"A local favourite in {city}: " + " ".join(rng.choice(["quiet", "historic", "lively", "scenic", "\"hidden\" gem", "family-run", "café"]) for _ in range(30)),
+                "rating": f"{rng.uniform(3.8, 5.0):.1f}/5",
+                "best_time_to_visit": rng.choice(["Early morning", "Sunset", "Weekdays", "Spring (March–May)"]),
+                "estimated_duration": rng.choice(["1-2 hours", "Half day", "Full day"]),
+                "tips": "Bring cash; some stalls don't take cards {no kidding}",
+            }
+            for i in range(8)
+        ],
+        "geographic_info": {
+            "continent": "Asia",
+            "country": destination.split(",")[-1].strip(),
+            "region": f"{city} Prefecture",
+            "coordinates": f"{rng.uniform(-60, 60):.4f}° N, {rng.uniform(-170, 170):.4f}° E",
+            "elevation": f"{rng.randint(0, 3500)} m",
+            "time_zone": "UTC+09:00 (JST)",
+            "local_currency": "Yen (JPY)",
+            "languages": ["Japanese", "English"],
+            "population": f"approx. {rng.randint(100000, 9000000):,}",
+        },
+        "climate_info": {
+            "climate_type": "Humid subtropical",
+            "seasons": {"spring": "Mild", "summer": "Hot and humid", "fall": "Crisp", "winter": "Cold, dry"},
+            "average_temperatures": {"summer_high": "33°C (91°F)", "summer_low": "24°C (75°F)", "winter_high": "9°C (48°F)", "winter_low": "1°C (34°F)"},
+            "rainfall": "Heaviest in June (tsuyu)",
+            "best_travel_months": ["March", "April", "October", "November"],
+        },
+    }
+
+
+def build_corpus(size: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        body = json.dumps(make_recommendation(rng, rng.choice(CITIES)), indent=2, ensure_ascii=False)
+        shape = i % 5
+        if shape == 0:
+            text = body
+        elif shape == 1:
+            text = f"```json\n{body}\n```"
+        elif shape == 2:
+            text = f"Here are my recommendations for your trip!\n\n{body}\n\nLet me know if you want {{more}} options."
+        elif shape == 3:
+            text = f"Sure.\n```json\n{body}\n```\nNote: prices change seasonally {{check locally}}."
+        else:
+            text = body[: int(len(body) * rng.uniform(0.55, 0.95))]
+        corpus.append((shape, text))
+    return corpus
+
+
+def legacy_parse(response: str):
+    try:
+        return json.loads(response)
+    except json.JSONDecodeError:
+        try:
+            match = re.search(r'\{.*\}', response, re.DOTALL)
+            if match:
+                return json.loads(match.group())
+            raise ValueError("No JSON found in response")
+        except (json.JSONDecodeError, ValueError):
+            return None
+
+
+def fast_parse(response: str):
+    return extract_json(response)[0]
+
+
+def measure(fn, corpus, repeat: int) -> float:
+    texts = [text for _, text in corpus]
+    seconds = timeit.timeit(lambda: [fn(text) for text in texts], number=max(1, repeat // len(texts)))
+    return seconds / (max(1, repeat // len(texts)) * len(texts)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=int, default=200, help="number of synthetic LLM outputs")
+    parser.add_argument("--repeat", type=int, default=4000, help="total parses per implementation")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.corpus)
+    labels = ["clean", "fenced", "prose+braces", "fenced+prose", "truncated"]
+    print(f"orjson: {'yes' if orjson is not None else 'no'}, corpus: {len(corpus)} outputs, "
+          f"avg {sum(len(text) for _, text in corpus) // len(corpus)} chars\n")
+
+    print(f"{'shape':<14}{'legacy ok':>10}{'fast ok':>10}{'legacy us':>12}{'fast us':>12}{'speedup':>9}")
+    for shape, label in enumerate(labels):
+        subset = [item for item in corpus if item[0] == shape]
+        legacy_ok = sum(legacy_parse(text) is not None for _, text in subset)
+        fast_ok = sum(fast_parse(text) is not None for _, text in subset)
+        legacy_us = measure(legacy_parse, subset, args.repeat // len(labels))
+        fast_us = measure(fast_parse, subset, args.repeat // len(labels))
+        print(f"{label:<14}{legacy_ok:>6}/{len(subset):<3}{fast_ok:>6}/{len(subset):<3}{legacy_us:>12.1f}{fast_us:>12.1f}{legacy_us / fast_us:>8.1f}x")
+
+    payloads = [make_recommendation(random.Random(i), CITIES[i % len(CITIES)]) for i in range(50)]
+    stdlib_us = measure(lambda payload: JSONResponse(payload).body, [(0, p) for p in payloads], args.repeat)
+    fast_us = measure(lambda payload: FastJSONResponse(payload).body, [(0, p) for p in payloads], args.repeat)
+    print(f"\n{'response render':<14}{'':>20}{stdlib_us:>12.1f}{fast_us:>12.1f}{stdlib_us / fast_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark: plain vs compact travel_recommendations storage.
+
+Builds a synthetic collection shaped like real history (many queries per city,
+each with verbose recommendations and the same per-city geographic_info and
+climate_info) and reports, per codec and level: stored BSON bytes including the
+shared facts documents, the size ratio against plain documents, and encode and
+full-decode throughput (BSON decode included, facts served from the codec's
+cache as they would be on a warm instance).
+
+    python benchmarks/bench_storage_codec.py [--documents 2000] [--cities 40]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+import bson
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_json_extract import make_recommendation  # noqa: E402
+from storage_codec import FACT_FIELDS, FACTS_CACHE_TTL, RecommendationCodec, make_facts_ref  # noqa: E402
+
+COUNTRIES = ["Japan", "Portugal", "Peru", "South Africa", "Iceland", "Vietnam", "Italy", "Mexico", "Kenya", "Canada"]
+PREFERENCES = [None, "food and markets", "museums", "hiking, viewpoints", "nightlife", "family friendly", "budget travel"]
+
+
+def build_dataset(documents: int, cities: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    destinations = [f"City{i}, {COUNTRIES[i % len(COUNTRIES)]}" for i in range(cities)]
+    facts = {destination: {field: make_recommendation(random.Random(i), destination)[field] for field in FACT_FIELDS}
+             for i, destination in enumerate(destinations)}
+    dataset = []
+    for i in range(documents):
+        destination = rng.choice(destinations)
+        body = make_recommendation(rng, destination)
+        dataset.append({
+            "id": f"{i:08d}-{rng.getrandbits(64):016x}",
+            "query": destination,
+            "recommendations": body["recommendations"],
+            **facts[destination],
+            "created_at": f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00+00:00",
+            "destination_key": destination.casefold(),
+            "preferences": rng.choice(PREFERENCES),
+            "fallback": False,
+        })
+    return dataset
+
+
+def codecs() -> list:
+    variants = [("zlib", 1), ("zlib", 6), ("zlib", 9)]
+    try:
+        import zstandard  # noqa: F401
+        variants += [("zstd", 3), ("zstd", 10)]
+    except ImportError:
+        print("zstandard not installed, skipping zstd\n")
+    return variants
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000, help="synthetic recommendations")
+    parser.add_argument("--cities", type=int, default=40, help="distinct destinations among them")
+    args = parser.parse_args()
+
+    dataset = build_dataset(args.documents, args.cities)
+    plain = [bson.encode(document) for document in dataset]
+    plain_bytes = sum(len(raw) for raw in plain)
+    started = time.perf_counter()
+    for raw in plain:
+        bson.decode(raw)
+    plain_decode = len(plain) / (time.perf_counter() - started)
+    print(f"{len(dataset)} documents, {args.cities} cities, plain: {plain_bytes / 1e6:.2f} MB, "
+          f"avg {plain_bytes // len(plain)} B/doc, decode {plain_decode:,.0f} docs/s\n")
+
+    print(f"{'codec':<9}{'stored MB':>11}{'avg B/doc':>11}{'facts KB':>10}{'ratio':>8}{'encode/s':>11}{'decode/s':>11}")
+    for name, level in codecs():
+        codec = RecommendationCodec(None, codec=name, level=level, facts_cache_size=args.cities * 2)
+
+        started = time.perf_counter()
+        encoded = [codec.encode(document) for document in dataset]
+        stored = [bson.encode(document) for document, _ in encoded]
+        encode_rate = len(dataset) / (time.perf_counter() - started)
+
+        facts = {}
+        for _, (ref, value) in encoded:
+            facts[ref] = value
+            codec.facts.set(ref, value, FACTS_CACHE_TTL)
+        facts_bytes = sum(len(bson.encode({"_id": ref, **value})) for ref, value in facts.items())
+        stored_bytes = sum(len(raw) for raw in stored)
+
+        started = time.perf_counter()
+        decoded = asyncio.run(codec.decode_many([bson.decode(raw) for raw in stored]))
+        decode_rate = len(dataset) / (time.perf_counter() - started)
+        assert all(
+            document["recommendations"] == original["recommendations"]
+            and make_facts_ref({field: document[field] for field in FACT_FIELDS}) == make_facts_ref({field: original[field] for field in FACT_FIELDS})
+            for document, original in zip(decoded, dataset)
+        ), "round trip mismatch"
+
+        total = stored_bytes + facts_bytes
+        print(f"{name + '-' + str(level):<9}{total / 1e6:>11.2f}{stored_bytes // len(stored):>11}{facts_bytes / 1e3:>10.1f}"
+              f"{plain_bytes / total:>7.1f}x{encode_rate:>11,.0f}{decode_rate:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Cold-start benchmark for the serverless entry point (backend/server.py).
+
+Each run starts a fresh interpreter, imports server, then sends the first
+request(s) in-process through httpx's ASGI transport, the way a cold serverless
+invocation would. One extra run uses ``python -X importtime`` to attribute the
+import cost to modules. Heavy dependencies still loaded after import or after
+the first request are listed, so a regression in lazy loading shows up by name.
+
+    python benchmarks/cold_start.py --runs 5 --output cold.json
+    python benchmarks/cold_start.py --path /api/ --path /api/status --mongo-url mongodb://localhost:27017
+
+Without --mongo-url only paths that do not touch the database make sense.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Module prefixes that should only load when a request actually needs them
+HEAVY_MODULES = ["motor", "pymongo", "emergentintegrations", "litellm", "openai", "google", "boto3", "numpy"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+heavy = {heavy!r}
+
+def loaded():
+    return sorted({{name.split(".")[0] for name in sys.modules if name.split(".")[0] in heavy}})
+
+after_import = loaded()
+
+async def first_requests():
+    import httpx
+    timings = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://cold-start") as client:
+        for path in {paths!r}:
+            begun = time.perf_counter()
+            response = await client.get(path)
+            timings.append({{"path": path, "status": response.status_code, "ms": (time.perf_counter() - begun) * 1000}})
+    return timings
+
+import asyncio
+requests = asyncio.run(first_requests())
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (time.perf_counter() - started) * 1000,
+    "requests": requests,
+    "heavy_after_import": after_import,
+    "heavy_after_requests": loaded(),
+}}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child_env(config: argparse.Namespace) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", config.mongo_url or "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "travel_compass_cold_start")
+    # Background work would otherwise compete with the first request
+    env.setdefault("PREWARM_ENABLED", "false")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+    return env
+
+
+def run_probe(config: argparse.Namespace) -> Dict[str, Any]:
+    code = PROBE.format(heavy=HEAVY_MODULES, paths=config.path)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=child_env(config), capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise SystemExit(f"Probe failed:\n{result.stderr}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["process_wall_ms"] = wall_ms
+    return report
+
+
+def import_profile(config: argparse.Namespace) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=child_env(config), capture_output=True, text=True,
+    )
+    entries = []
+    children: List[Dict[str, Any]] = []
+    direct: List[Dict[str, Any]] = []
+    server_entry = None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        entry = {"module": name, "depth": len(indent) // 2, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000}
+        entries.append(entry)
+        # -X importtime prints children before their parent, so the depth-1 entries seen
+        # since the previous top-level import belong to the next top-level one
+        if entry["depth"] == 1:
+            children.append(entry)
+        elif entry["depth"] == 0:
+            if name == "server":
+                server_entry, direct = entry, children
+            children = []
+    direct = sorted(direct, key=lambda entry: -entry["cumulative_ms"])
+    slowest = sorted(entries, key=lambda entry: -entry["self_ms"])
+    return {
+        "server_cumulative_ms": server_entry["cumulative_ms"] if server_entry else None,
+        "modules_imported": len(entries),
+        "direct_imports": [{key: entry[key] for key in ("module", "cumulative_ms")} for entry in direct[:config.top]],
+        "slowest_self": [{key: entry[key] for key in ("module", "self_ms")} for entry in slowest[:config.top]],
+    }
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(values), 2),
+        "min": round(min(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--path", action="append", help="GET path for the first request(s), default /api/")
+    parser.add_argument("--mongo-url", default=None, help="MongoDB for paths that touch the database")
+    parser.add_argument("--top", type=int, default=15, help="modules to list in the import profile")
+    parser.add_argument("--output", default=None, help="also write the JSON report to this file")
+    config = parser.parse_args()
+    config.path = config.path or ["/api/"]
+
+    probes = [run_probe(config) for _ in range(config.runs)]
+    report = {
+        "python": sys.version.split()[0],
+        "runs": config.runs,
+        "paths": config.path,
+        "process_wall_ms": summarize([probe["process_wall_ms"] for probe in probes]),
+        "import_ms": summarize([probe["import_ms"] for probe in probes]),
+        "first_response_ms": summarize([probe["first_response_ms"] for probe in probes]),
+        "requests": probes[-1]["requests"],
+        "heavy_after_import": probes[-1]["heavy_after_import"],
+        "heavy_after_requests": probes[-1]["heavy_after_requests"],
+        "import_profile": import_profile(config),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if config.output:
+        Path(config.output).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
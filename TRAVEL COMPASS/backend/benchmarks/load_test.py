@@ -0,0 +1,306 @@
+"""Offline load test: the FastAPI app in-process, a stub LLM and a Mongo stand-in.
+
+Nothing leaves the machine. ``emergentintegrations`` is replaced by a stub
+LlmChat with configurable latency, streaming and malformed/truncated output
+rates, and Motor by mongomock_motor (or a real server via --mongo-url). Requests
+go through httpx's ASGI transport, so routing, validation, middleware and
+serialization are all exercised. The report is JSON, so runs can be diffed
+between commits:
+
+    pip install -r requirements.txt
+    python benchmarks/load_test.py --duration 20 --concurrency 64 --output before.json
+
+Defaults mix recommendations (plain and streamed), history and status traffic;
+see --help for the knobs.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DESTINATIONS = [
+    "Paris, France", "Kyoto, Japan", "Lisbon, Portugal", "Cusco, Peru", "Cape Town, South Africa",
+    "Reykjavik, Iceland", "Hanoi, Vietnam", "Marrakesh, Morocco", "Queenstown, New Zealand", "Banff, Canada",
+    "Istanbul, Turkey", "Bali, Indonesia", "Prague, Czech Republic", "Buenos Aires, Argentina", "Seoul, South Korea",
+]
+PREFERENCES = [
+    None, "museums and cheap food", "hiking, nature, photography", "nightlife and street food",
+    "family friendly, beaches", "history and architecture", "luxury hotels and fine dining", "budget backpacking",
+]
+
+
+def stub_response(rng: random.Random, text: str) -> str:
+    """A plausible model answer for the prompt, in one of the shapes real models produce."""
+    destination = text.split("DESTINATION:", 1)[-1].split("\n", 1)[0].strip() or "Somewhere"
+    city = destination.split(",")[0]
+    body = json.dumps({
+        "recommendations": [
+            {
+                "name": f"{city} highlight {i}",
+                "type": rng.choice(["attraction", "restaurant", "activity", "accommodation"]),
+                "description": f"One of the best things to do in {city}. " * 4,
+                "rating": f"{rng.uniform(3.8, 5):.1f}/5",
+                "best_time_to_visit": "Morning",
+                "estimated_duration": "2 hours",
+                "tips": "Book ahead in high season",
+            }
+            for i in range(8)
+        ],
+        "geographic_info": {
+            "continent": "Europe", "country": destination.split(",")[-1].strip(), "region": city,
+            "coordinates": "0.0000° N, 0.0000° E", "elevation": "50 m", "time_zone": "UTC+01:00",
+            "local_currency": "Euro (EUR)", "languages": ["Local"], "population": "approx. 1,000,000",
+        },
+        "climate_info": {
+            "climate_type": "Temperate", "seasons": {"spring": "Mild", "summer": "Warm", "fall": "Cool", "winter": "Cold"},
+            "average_temperatures": {"summer_high": "25°C", "summer_low": "15°C", "winter_high": "8°C", "winter_low": "1°C"},
+            "rainfall": "Moderate", "best_travel_months": ["May", "June", "September"],
+        },
+    }, indent=2)
+    return rng.choice([body, f"```json\n{body}\n```", f"Here is your guide:\n{body}\nEnjoy!"])
+
+
+def install_stub_llm(config: argparse.Namespace) -> Dict[str, int]:
+    """Register a fake ``emergentintegrations.llm.chat`` before server.py imports it."""
+    rng = random.Random(config.seed)
+    calls = {"calls": 0, "malformed": 0, "truncated": 0}
+
+    class UserMessage:
+        def __init__(self, text: str):
+            self.text = text
+
+    class LlmChat:
+        def __init__(self, api_key=None, session_id=None, system_message=None):
+            self.session_id = session_id
+
+        def with_model(self, provider, model):
+            return self
+
+        def _answer(self, message: UserMessage) -> str:
+            calls["calls"] += 1
+            roll = rng.random()
+            if roll < config.malformed_rate:
+                calls["malformed"] += 1
+                return "I'm sorry, I can't produce structured output for that request right now."
+            answer = stub_response(rng, message.text)
+            if roll < config.malformed_rate + config.truncated_rate:
+                calls["truncated"] += 1
+                answer = answer[: int(len(answer) * rng.uniform(0.3, 0.9))]
+            return answer
+
+        def _latency(self) -> float:
+            return max(0.0, rng.gauss(config.llm_latency_ms, config.llm_jitter_ms)) / 1000
+
+        async def send_message(self, message: UserMessage) -> str:
+            await asyncio.sleep(self._latency())
+            return self._answer(message)
+
+        async def stream_message(self, message: UserMessage):
+            answer = self._answer(message)
+            chunks = max(1, len(answer) // config.chunk_chars)
+            delay = self._latency() / chunks
+            for start in range(0, len(answer), config.chunk_chars):
+                await asyncio.sleep(delay)
+                yield answer[start:start + config.chunk_chars]
+
+    package = types.ModuleType("emergentintegrations")
+    llm = types.ModuleType("emergentintegrations.llm")
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat, chat.UserMessage = LlmChat, UserMessage
+    package.llm, llm.chat = llm, chat
+    sys.modules.update({"emergentintegrations": package, "emergentintegrations.llm": llm, "emergentintegrations.llm.chat": chat})
+    if not config.streaming:
+        del LlmChat.stream_message
+    return calls
+
+
+def install_mongo(config: argparse.Namespace) -> None:
+    os.environ["MONGO_URL"] = config.mongo_url or "mongodb://localhost:27017"
+    os.environ.setdefault("DB_NAME", config.db_name)
+    if config.mongo_url:
+        return
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    values = sorted(samples)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "rps": round((len(values) + errors) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(config: argparse.Namespace) -> Dict[str, Any]:
+    llm_calls = install_stub_llm(config)
+    install_mongo(config)
+    # Per-client limits are off unless asked for; the in-flight budget always applies
+    os.environ["ADMISSION_RATE_PER_SECOND"] = str(config.admission_rate)
+    # The simulated clients below identify themselves as if through one proxy
+    os.environ["ADMISSION_TRUSTED_PROXIES"] = "1"
+    import httpx
+    import server
+    # Per-request access logs would dominate the run
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    rng = random.Random(config.seed + 1)
+    destinations = DESTINATIONS[: config.destinations]
+    mix = {name: float(weight) for name, weight in (item.split("=") for item in config.mix.split(","))}
+
+    async def recommendation(client):
+        payload = {"destination": rng.choice(destinations), "preferences": rng.choice(PREFERENCES)}
+        return await client.post("/api/recommendations", json=payload)
+
+    async def recommendation_stream(client):
+        payload = {"destination": rng.choice(destinations), "preferences": rng.choice(PREFERENCES)}
+        return await client.post("/api/recommendations/stream", json=payload, params={"format": "ndjson"})
+
+    async def history(client):
+        return await client.get("/api/recommendations/history", params={"limit": 10})
+
+    async def status_write(client):
+        return await client.post("/api/status", json={"client_name": f"load-{rng.randint(1, 20)}"})
+
+    async def status_read(client):
+        return await client.get("/api/status", params={"limit": 100})
+
+    operations = {
+        "recommendations": recommendation,
+        "recommendations_stream": recommendation_stream,
+        "history": history,
+        "status_write": status_write,
+        "status_read": status_read,
+    }
+    unknown = set(mix) - set(operations)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    statuses: Dict[str, int] = {}
+
+    await server.app.router.startup()
+    transport = httpx.ASGITransport(app=server.app)
+    # Each simulated client has its own address, which admission control keys its buckets on
+    clients = [
+        httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=config.timeout, headers={"X-Forwarded-For": f"10.0.{i // 256}.{i % 256}"})
+        for i in range(max(1, config.clients or config.concurrency))
+    ]
+    try:
+        deadline = time.perf_counter() + config.duration
+        remaining = [config.requests]
+
+        async def worker(client):
+            while time.perf_counter() < deadline and (config.requests == 0 or remaining[0] > 0):
+                remaining[0] -= 1
+                name = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = await operations[name](client)
+                    await response.aread()
+                    status = str(response.status_code)
+                except Exception as e:
+                    status = type(e).__name__
+                statuses[status] = statuses.get(status, 0) + 1
+                if status.startswith("2"):
+                    samples[name].append(time.perf_counter() - started)
+                else:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(clients[i % len(clients)]) for i in range(config.concurrency)))
+        elapsed = time.perf_counter() - started
+        await server.write_queue.flush()
+    finally:
+        for client in clients:
+            await client.aclose()
+
+    await server.app.router.shutdown()
+
+    sources = {key[0]: int(value) for key, value in server.recommendation_results.values.items()}
+    generated = sources.get("llm", 0) + sources.get("fallback", 0)
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(config).items() if key != "output"},
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": summarize(all_samples, sum(errors.values()), elapsed),
+        "endpoints": {name: summarize(samples[name], errors[name], elapsed) for name in names},
+        "status_codes": statuses,
+        "recommendation_sources": sources,
+        "fallback_rate": round(sources.get("fallback", 0) / generated, 4) if generated else 0.0,
+        "llm_parse": {key[0]: int(value) for key, value in server.llm_parse_results.values.items()},
+        "llm_stub": llm_calls,
+        "llm_pool": server.llm_pool.stats(),
+        "recommendation_cache": server.recommendation_cache.stats(),
+        "write_queue": server.write_queue.stats(),
+        "admission": server.admission_controller.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run (default 10)")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = duration only)")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--mix", default="recommendations=4,recommendations_stream=1,history=3,status_write=1,status_read=1",
+                        help="operation=weight pairs")
+    parser.add_argument("--destinations", type=int, default=len(DESTINATIONS), help="distinct destinations, lower means more cache hits")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="mean stub LLM latency")
+    parser.add_argument("--llm-jitter-ms", type=float, default=250.0, help="standard deviation of stub LLM latency")
+    parser.add_argument("--malformed-rate", type=float, default=0.05, help="share of LLM answers with no JSON at all")
+    parser.add_argument("--truncated-rate", type=float, default=0.05, help="share of LLM answers cut off mid-object")
+    parser.add_argument("--no-streaming", dest="streaming", action="store_false", help="stub LLM without stream_message")
+    parser.add_argument("--chunk-chars", type=int, default=64, help="characters per streamed chunk")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request in seconds")
+    parser.add_argument("--clients", type=int, default=0, help="distinct client addresses (default: one per concurrent client)")
+    parser.add_argument("--admission-rate", type=float, default=0.0, help="per-client LLM requests per second (0 = no per-client limit)")
+    parser.add_argument("--mongo-url", default=None, help="use a real MongoDB instead of mongomock")
+    parser.add_argument("--db-name", default="travel_compass_load_test")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="also write the JSON report to this file")
+    config = parser.parse_args()
+    config.destinations = max(1, min(config.destinations, len(DESTINATIONS)))
+
+    report = asyncio.run(run(config))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if config.output:
+        Path(config.output).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from recommendation_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of geographic_info/climate_info in the prompt changes;
+# documents written under an older version are ignored and regenerated
+FACTS_VERSION = 1
+
+
+class DestinationFactsStore:
+    """Long-lived store of per-destination geographic_info and climate_info.
+
+    These facts barely change, so they are kept far longer than recommendations:
+    an in-process TTL/LRU in front of a Mongo collection keyed by the normalized
+    destination, with a TTL index on ``expires_at`` and a ``version`` field so a
+    schema change invalidates old entries without a migration.
+
+    In-process copies live at most ``local_ttl_seconds``, not the full TTL:
+    ``invalidate`` only clears the worker that runs it, so the others pick up the
+    change once their copies run out.
+    """
+
+    def __init__(
+        self,
+        collection,
+        maxsize: int = 1024,
+        ttl_seconds: int = 7776000,
+        version: int = FACTS_VERSION,
+        local_ttl_seconds: float = 60,
+    ):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.local_ttl_seconds = local_ttl_seconds
+        self.version = version
+        self.local = TTLCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, destination_key: str) -> Optional[Dict[str, Any]]:
+        facts = self.local.get(destination_key)
+        if facts is not None:
+            self.hits += 1
+            return facts
+
+        now = datetime.now(timezone.utc)
+        try:
+            doc = await self.collection.find_one(
+                {"_id": destination_key, "version": self.version, "expires_at": {"$gt": now}}
+            )
+        except Exception as e:
+            logger.warning(f"Destination facts lookup failed: {str(e)}")
+            doc = None
+        if doc is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        facts = {"geographic_info": doc["geographic_info"], "climate_info": doc["climate_info"]}
+        expires_at = doc["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self.local.set(destination_key, facts, min(self.local_ttl_seconds, (expires_at - now).total_seconds()))
+        return facts
+
+    async def set(self, destination_key: str, geographic_info: Dict[str, Any], climate_info: Dict[str, Any]) -> None:
+        facts = {"geographic_info": geographic_info, "climate_info": climate_info}
+        self.local.set(destination_key, facts, min(self.local_ttl_seconds, self.ttl_seconds))
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.replace_one(
+                {"_id": destination_key},
+                {
+                    "_id": destination_key,
+                    "version": self.version,
+                    **facts,
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Destination facts write failed: {str(e)}")
+
+    async def invalidate(self, destination_key: Optional[str] = None) -> int:
+        if destination_key is None:
+            self.local.clear()
+            result = await self.collection.delete_many({})
+        else:
+            self.local.pop(destination_key)
+            result = await self.collection.delete_many({"_id": destination_key})
+        return result.deleted_count
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "local_size": len(self.local),
+            "version": self.version,
+            "ttl_seconds": self.ttl_seconds,
+            "local_ttl_seconds": self.local_ttl_seconds,
+        }
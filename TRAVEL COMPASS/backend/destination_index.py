@@ -0,0 +1,117 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+from recommendation_cache import normalize_destination
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Best (weight, key) pairs under this prefix, highest weight first
+        self.top: List[Tuple[int, str]] = []
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DestinationIndex:
+    """In-memory typeahead index over destination names.
+
+    Prefix matches come from a character trie in which every node keeps its own
+    top-``top_k`` list, so a lookup is one walk down the prefix with no subtree
+    scan. Names are also reachable from the start of every word ("york" finds
+    "New York"). Misspellings ("tokio") fall back to a trigram index ranked by
+    Dice similarity. Weights only grow (one per stored recommendation), which keeps
+    the per-node top lists exact under incremental updates.
+    """
+
+    def __init__(self, top_k: int = 10, min_similarity: float = 0.35):
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self._root = _Node()
+        self.weights: Dict[str, int] = {}
+        self.display: Dict[str, str] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._gram_counts: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.weights)
+
+    def add(self, name: str, weight: int = 1, canonical: bool = False) -> None:
+        """Add ``weight`` to a destination, inserting it on first sight.
+
+        ``canonical`` names (e.g. from the gazetteer) replace any earlier display form.
+        """
+        key = normalize_destination(name)
+        if not key:
+            return
+        if key not in self.weights:
+            self.weights[key] = 0
+            grams = _trigrams(key)
+            self._gram_counts[key] = len(grams)
+            for gram in grams:
+                self._trigrams[gram].add(key)
+        if canonical or key not in self.display:
+            self.display[key] = name.strip()
+        self.weights[key] += weight
+
+        words = key.split(" ")
+        for start in range(len(words)):
+            self._promote(" ".join(words[start:]), key)
+
+    def _promote(self, path: str, key: str) -> None:
+        weight = self.weights[key]
+        node = self._root
+        for ch in path:
+            node = node.children.setdefault(ch, _Node())
+            top = node.top
+            for i, (_, existing) in enumerate(top):
+                if existing == key:
+                    del top[i]
+                    break
+            if len(top) < self.top_k or weight > top[-1][0]:
+                top.append((weight, key))
+                top.sort(key=lambda item: (-item[0], item[1]))
+                del top[self.top_k:]
+
+    def _prefix(self, prefix: str) -> List[Tuple[int, str]]:
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.top
+
+    def _fuzzy(self, text: str, exclude: Set[str]) -> List[Tuple[float, str]]:
+        grams = _trigrams(text)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for key in self._trigrams.get(gram, ()):
+                shared[key] += 1
+        scored = []
+        for key, count in shared.items():
+            if key in exclude:
+                continue
+            similarity = 2 * count / (len(grams) + self._gram_counts[key])
+            if similarity >= self.min_similarity:
+                scored.append((similarity, key))
+        scored.sort(key=lambda item: (-item[0], -self.weights[item[1]], item[1]))
+        return scored
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        text = normalize_destination(query)
+        if not text:
+            return []
+        suggestions = [
+            {"destination": self.display[key], "match": "prefix", "score": weight}
+            for weight, key in self._prefix(text)[:limit]
+        ]
+        if len(suggestions) < limit:
+            seen = {normalize_destination(item["destination"]) for item in suggestions}
+            for similarity, key in self._fuzzy(text, seen)[:limit - len(suggestions)]:
+                suggestions.append({"destination": self.display[key], "match": "fuzzy", "score": round(similarity, 3)})
+        return suggestions
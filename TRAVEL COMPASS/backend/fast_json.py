@@ -0,0 +1,154 @@
+"""JSON helpers for the LLM hot path: orjson when installed, stdlib json otherwise.
+
+``extract_json`` pulls the recommendation object out of raw model output. It
+skips preambles and code fences, ignores whatever follows the closing brace (even
+if that text contains braces of its own) and, when the model stopped mid-object,
+closes the open strings, arrays and objects so that what did arrive can still be
+used. See benchmarks/bench_json_extract.py for numbers against the old regex path.
+"""
+import json
+import re
+from typing import Any, Callable, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(value: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+else:
+    loads = json.loads
+
+    def dumps(value: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        return json.dumps(value, default=default, ensure_ascii=False, separators=(",", ":"))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson. Falls back to the stdlib encoder without it."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+_CLOSERS = {"{": "}", "[": "]"}
+# Whole strings (escapes included) or single structural characters; a lone quote
+# is a string the text ended inside of
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\],]|"', re.DOTALL)
+
+
+def _scan(text: str, start: int) -> Tuple[int, str, bool, int, str]:
+    """Scan one JSON value that opens at ``text[start]``.
+
+    Returns (end, open_stack, in_string, safe_end, safe_stack): ``end`` is one past
+    the closing bracket, or -1 if the text ran out first. ``open_stack`` holds the
+    brackets still open at the end of the text. ``safe_end``/``safe_stack`` describe
+    the last point at which every value so far was complete (just before a comma or
+    just after an opening bracket), used when the tail cannot be repaired as-is.
+    Strings are skipped whole by the regex, so the Python loop only sees structure.
+    """
+    stack: List[str] = []
+    safe_end, safe_stack = start, ""
+    for match in _TOKEN.finditer(text, start):
+        token = match.group()
+        ch = token[0]
+        if ch == '"':
+            if len(token) == 1:
+                return -1, "".join(stack), True, safe_end, safe_stack
+        elif ch in "{[":
+            stack.append(ch)
+            safe_end, safe_stack = match.end(), "".join(stack)
+        elif ch in "}]":
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                return -1, "", False, safe_end, safe_stack
+            stack.pop()
+            if not stack:
+                return match.end(), "", False, safe_end, safe_stack
+        else:
+            safe_end, safe_stack = match.start(), "".join(stack)
+    return -1, "".join(stack), False, safe_end, safe_stack
+
+
+def _close(fragment: str, stack: str) -> str:
+    return fragment + "".join(_CLOSERS[ch] for ch in reversed(stack))
+
+
+def _repair(text: str, start: int, stack: str, in_string: bool, safe_end: int, safe_stack: str) -> Optional[Any]:
+    # First try to keep everything: finish the open string and drop a dangling separator
+    tail = text[start:]
+    if in_string:
+        tail += '"'
+    tail = tail.rstrip()
+    while tail and tail[-1] in ",:":
+        tail = tail[:-1].rstrip()
+    for candidate in (_close(tail, stack), _close(text[start:safe_end], safe_stack)):
+        try:
+            return loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+_decoder = json.JSONDecoder()
+
+
+def _decode_prefix(text: str, start: int) -> Any:
+    """Decode the value that opens at ``text[start]`` and ignore whatever follows it."""
+    if orjson is None:
+        return _decoder.raw_decode(text, start)[0]
+    # Cutting at the last brace drops closing fences and postscripts without a failed parse
+    document = text[start:text.rfind("}") + 1]
+    try:
+        return orjson.loads(document)
+    except orjson.JSONDecodeError as e:
+        # The error position is where trailing text begins; anything else fails again below
+        if not 0 < e.pos < len(document):
+            raise
+        return orjson.loads(document[:e.pos])
+
+
+def extract_json(text: str, repair: bool = True) -> Tuple[Optional[dict], bool]:
+    """Return (object, repaired) for the first JSON object in ``text``.
+
+    ``object`` is None when nothing usable was found. ``repaired`` is True when
+    the object was truncated and had to be closed, so the caller can treat it as
+    partial. The common shapes (bare, fenced, wrapped in prose) cost one or two
+    C-level parses; the bracket scanner only runs when those fail.
+    """
+    # Skip past an opening code fence so language tags like ```json are never scanned
+    position = 0
+    fence = text.find("```")
+    if fence != -1 and text.find("{") > fence:
+        position = text.find("\n", fence)
+        position = fence + 3 if position == -1 else position
+
+    while True:
+        start = text.find("{", position)
+        if start == -1:
+            return None, False
+        try:
+            value = _decode_prefix(text, start)
+            if isinstance(value, dict):
+                return value, False
+        except ValueError:
+            pass
+
+        end, stack, in_string, safe_end, safe_stack = _scan(text, start)
+        if end == -1 and stack:
+            # Truncated: nothing after this point can close, so repair or give up
+            if repair:
+                value = _repair(text, start, stack, in_string, safe_end, safe_stack)
+                if isinstance(value, dict):
+                    return value, True
+            return None, False
+        # Braces in a preamble ("{destination}") or an invalid object: skip the whole
+        # balanced value rather than stepping into it, so a nested section is never
+        # mistaken for the top level
+        position = end if end != -1 else start + 1
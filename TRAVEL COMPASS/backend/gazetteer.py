@@ -0,0 +1,250 @@
+"""Offline gazetteer: resolve a destination to static geographic facts without the LLM.
+
+data/gazetteer.csv is the editable source. It is compiled into a compact binary
+file that is memory-mapped at startup:
+
+    header | records (fixed width) | name index (sorted) | string table
+
+Records hold coordinates, elevation and population inline and every text field as
+an offset into the string table. The name index maps each normalized name/alias to
+a record and is sorted by key, so a lookup is a binary search over the mapping with
+no parsing or per-entry Python objects.
+
+    python gazetteer.py build [csv] [out]
+    python gazetteer.py lookup "Kyoto, Japan"
+"""
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from recommendation_cache import normalize_destination
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+DEFAULT_CSV = DATA_DIR / "gazetteer.csv"
+
+MAGIC = b"GAZ1"
+# magic, record count, index entry count, index offset, string table offset
+HEADER = struct.Struct("<4sIIII")
+# latitude, longitude, elevation_m, population, then string offsets for
+# name, country, region, continent, time_zone, utc_offset, currency, languages
+RECORD = struct.Struct("<ddiI8I")
+# key string offset, record number
+INDEX_ENTRY = struct.Struct("<II")
+STRING_LENGTH = struct.Struct("<H")
+
+MISSING_ELEVATION = -(2 ** 31)
+TEXT_FIELDS = ("name", "country", "region", "continent", "time_zone", "utc_offset", "currency", "languages")
+
+# Common short forms of country hints, normalized, mapped to the normalized gazetteer country
+COUNTRY_HINTS = {
+    "usa": "united states",
+    "us": "united states",
+    "u s a": "united states",
+    "u s": "united states",
+    "united states of america": "united states",
+    "america": "united states",
+    "uk": "united kingdom",
+    "u k": "united kingdom",
+    "great britain": "united kingdom",
+    "britain": "united kingdom",
+    "england": "united kingdom",
+    "scotland": "united kingdom",
+    "wales": "united kingdom",
+    "uae": "united arab emirates",
+    "holland": "netherlands",
+    "the netherlands": "netherlands",
+    "czechia": "czech republic",
+    "korea": "south korea",
+}
+
+
+def build_gazetteer(csv_path: Path = DEFAULT_CSV, out_path: Optional[Path] = None) -> Path:
+    """Compile the CSV source into the binary format and return the output path."""
+    csv_path = Path(csv_path)
+    out_path = Path(out_path) if out_path else csv_path.with_suffix(".bin")
+
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in string_offsets:
+            encoded = value.encode("utf-8")
+            string_offsets[value] = len(strings)
+            strings.extend(STRING_LENGTH.pack(len(encoded)))
+            strings.extend(encoded)
+        return string_offsets[value]
+
+    records = bytearray()
+    index = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for number, row in enumerate(csv.DictReader(f)):
+            records.extend(RECORD.pack(
+                float(row["latitude"]),
+                float(row["longitude"]),
+                int(row["elevation_m"]) if row["elevation_m"] else MISSING_ELEVATION,
+                int(row["population"]) if row["population"] else 0,
+                *(intern(row[field]) for field in TEXT_FIELDS),
+            ))
+            names = [row["name"]] + [alias for alias in row["aliases"].split("|") if alias]
+            for key in {normalize_destination(name) for name in names}:
+                index.append((key.encode("utf-8"), number))
+
+    # Ties keep CSV order, so earlier (more popular) rows win ambiguous names
+    index.sort(key=lambda entry: entry[0])
+    index_bytes = b"".join(INDEX_ENTRY.pack(intern(key.decode("utf-8")), number) for key, number in index)
+
+    index_offset = HEADER.size + len(records)
+    strings_offset = index_offset + len(index_bytes)
+    header = HEADER.pack(MAGIC, len(records) // RECORD.size, len(index), index_offset, strings_offset)
+
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header + records + index_bytes + bytes(strings))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class Gazetteer:
+    """Read-only view over a compiled gazetteer file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.record_count, self.index_count, self._index_offset, self._strings_offset = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a gazetteer file")
+
+    def __len__(self):
+        return self.record_count
+
+    def close(self) -> None:
+        self._data.close()
+
+    def _string(self, offset: int) -> str:
+        position = self._strings_offset + offset
+        (length,) = STRING_LENGTH.unpack_from(self._data, position)
+        start = position + STRING_LENGTH.size
+        return self._data[start:start + length].decode("utf-8")
+
+    def _key_bytes(self, slot: int) -> bytes:
+        key_offset, _ = INDEX_ENTRY.unpack_from(self._data, self._index_offset + slot * INDEX_ENTRY.size)
+        position = self._strings_offset + key_offset
+        (length,) = STRING_LENGTH.unpack_from(self._data, position)
+        start = position + STRING_LENGTH.size
+        return self._data[start:start + length]
+
+    def _record(self, number: int) -> Dict[str, Any]:
+        values = RECORD.unpack_from(self._data, HEADER.size + number * RECORD.size)
+        latitude, longitude, elevation, population = values[:4]
+        record = {field: self._string(offset) for field, offset in zip(TEXT_FIELDS, values[4:])}
+        record["languages"] = [language for language in record["languages"].split("|") if language]
+        record["latitude"] = latitude
+        record["longitude"] = longitude
+        record["elevation_m"] = None if elevation == MISSING_ELEVATION else elevation
+        record["population"] = population or None
+        return record
+
+    def _find(self, key: str) -> List[int]:
+        """Record numbers whose normalized name or alias equals ``key``."""
+        target = key.encode("utf-8")
+        low, high = 0, self.index_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_bytes(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        numbers = []
+        while low < self.index_count and self._key_bytes(low) == target:
+            _, number = INDEX_ENTRY.unpack_from(self._data, self._index_offset + low * INDEX_ENTRY.size)
+            numbers.append(number)
+            low += 1
+        return numbers
+
+    def names(self) -> List[str]:
+        """Canonical display names of every record, in file order."""
+        return [self._record(number)["name"] for number in range(self.record_count)]
+
+    def lookup(self, destination: str) -> Optional[Dict[str, Any]]:
+        """Resolve "Kyoto", "kyoto, japan" or an alias like "Saigon" to a record.
+
+        Text after the first comma is a country or region hint ("Paris, Texas"); when
+        the name only matches places the hint rules out, the answer is None rather than
+        a namesake somewhere else.
+        """
+        numbers = self._find(normalize_destination(destination))
+        if numbers:
+            # The whole string is a known name or alias, e.g. "Washington, D.C."
+            return self._record(numbers[0])
+
+        parts = destination.split(",")
+        name = normalize_destination(parts[0])
+        numbers = self._find(name) if name else []
+        if not numbers:
+            return None
+        records = [self._record(number) for number in numbers]
+        hints = {COUNTRY_HINTS.get(hint, hint) for hint in map(normalize_destination, parts[1:]) if hint}
+        if not hints:
+            return records[0]
+        for record in records:
+            if hints & {normalize_destination(record["country"]), normalize_destination(record["region"])}:
+                return record
+        return None
+
+
+def to_geographic_info(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Render a gazetteer record in the geographic_info shape the LLM prompt asks for."""
+    latitude, longitude = record["latitude"], record["longitude"]
+    info = {
+        "continent": record["continent"],
+        "country": record["country"],
+        "region": record["region"],
+        "coordinates": f"{abs(latitude):.4f}° {'N' if latitude >= 0 else 'S'}, {abs(longitude):.4f}° {'E' if longitude >= 0 else 'W'}",
+        "time_zone": f"{record['utc_offset']} ({record['time_zone']})",
+        "local_currency": record["currency"],
+        "languages": record["languages"],
+    }
+    if record["elevation_m"] is not None:
+        info["elevation"] = f"{record['elevation_m']} m ({round(record['elevation_m'] * 3.28084)} ft)"
+    if record["population"]:
+        info["population"] = f"approx. {record['population']:,}"
+    return info
+
+
+def load_gazetteer(csv_path: Path = DEFAULT_CSV) -> Gazetteer:
+    """Open the compiled gazetteer next to the CSV, (re)building it when missing or stale.
+
+    Falls back to the temp directory when the data directory is read-only.
+    """
+    csv_path = Path(csv_path)
+    candidates = [csv_path.with_suffix(".bin"), Path(tempfile.gettempdir()) / "travel-compass-gazetteer.bin"]
+    for path in candidates:
+        if path.exists() and path.stat().st_mtime >= csv_path.stat().st_mtime:
+            return Gazetteer(path)
+    for path in candidates:
+        try:
+            return Gazetteer(build_gazetteer(csv_path, path))
+        except OSError as e:
+            logger.warning(f"Could not write gazetteer to {path}: {str(e)}")
+    raise OSError("No writable location for the compiled gazetteer")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        source = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CSV
+        output = build_gazetteer(source, Path(sys.argv[3]) if len(sys.argv) > 3 else None)
+        print(f"Wrote {output} ({output.stat().st_size} bytes, {len(Gazetteer(output))} records)")
+    elif len(sys.argv) == 3 and sys.argv[1] == "lookup":
+        found = load_gazetteer().lookup(sys.argv[2])
+        print(to_geographic_info(found) if found else "Not found")
+    else:
+        print(__doc__)
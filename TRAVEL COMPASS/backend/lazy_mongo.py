@@ -0,0 +1,52 @@
+from typing import Any, Callable, Dict, Optional
+
+
+class LazyCollection:
+    """Collection handle that resolves the real Motor collection on first attribute access."""
+
+    __slots__ = ("_database", "_name", "_collection")
+
+    def __init__(self, database: "LazyDatabase", name: str):
+        self._database = database
+        self._name = name
+        self._collection = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        if self._collection is None:
+            self._collection = self._database.resolve()[self._name]
+        return getattr(self._collection, attribute)
+
+
+class LazyDatabase:
+    """Stands in for a Motor database so importing the app opens no client.
+
+    ``connect`` (which imports Motor and builds the client) runs the first time a
+    collection is actually used, and the result is kept for the life of the
+    process, so warm invocations reuse the same client and connection pool.
+    Collection handles can be taken at import time and passed around as usual.
+    """
+
+    def __init__(self, connect: Callable[[], Any]):
+        self._connect = connect
+        self._database: Optional[Any] = None
+        self._collections: Dict[str, LazyCollection] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._database is not None
+
+    def resolve(self) -> Any:
+        if self._database is None:
+            self._database = self._connect()
+        return self._database
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = LazyCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
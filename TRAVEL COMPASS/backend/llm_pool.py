@@ -0,0 +1,115 @@
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+
+class LlmPoolSaturated(Exception):
+    """Raised when the LLM wait queue is full or a caller waited longer than allowed."""
+
+
+class LlmClientPool:
+    """Bounded pool of stateless LLM sessions.
+
+    Every call gets a chat built by ``factory`` with a fresh session id, so no
+    conversation history is shared between requests or grows over the life of the
+    process. At most ``max_concurrency`` calls run at once; up to ``max_queue`` more
+    wait for a slot, and anything beyond that is rejected immediately (backpressure).
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        max_concurrency: int = 8,
+        max_queue: int = 32,
+        queue_timeout: Optional[float] = None,
+    ):
+        self.factory = factory
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.acquired = 0
+
+    def new_session(self) -> Any:
+        return self.factory(f"travel-guide-{uuid.uuid4()}")
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.waiting >= self.max_queue and self._semaphore.locked():
+            self.rejected += 1
+            raise LlmPoolSaturated("LLM queue is full")
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LlmPoolSaturated("Timed out waiting for an LLM slot")
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - started
+        self.acquired += 1
+        self.queue_wait_total += waited
+        self.queue_wait_max = max(self.queue_wait_max, waited)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def send(self, message) -> str:
+        """Send on a fresh session; the caller must already hold a ``slot()``."""
+        try:
+            response = await self.new_session().send_message(message)
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return response
+
+    async def send_message(self, message) -> str:
+        async with self.slot():
+            return await self.send(message)
+
+    async def stream_message(self, message) -> AsyncIterator[str]:
+        """Yield the response in chunks as the model produces it.
+
+        Falls back to a single chunk when the chat client has no streaming support.
+        """
+        async with self.slot():
+            session = self.new_session()
+            try:
+                if hasattr(session, "stream_message"):
+                    async for chunk in session.stream_message(message):
+                        yield chunk
+                else:
+                    yield await session.send_message(message)
+            except Exception:
+                self.failed += 1
+                raise
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_avg_ms": round(self.queue_wait_total / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+        }
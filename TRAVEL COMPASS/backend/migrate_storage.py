@@ -0,0 +1,157 @@
+"""Convert stored travel_recommendations between the plain and the compact format.
+
+    python migrate_storage.py --dry-run              # sizes only, nothing is written
+    python migrate_storage.py --codec zlib           # plain -> compact (resumable)
+    python migrate_storage.py --decode               # compact -> plain, e.g. before STORAGE_CODEC=none
+    python migrate_storage.py --destination-keys     # add destination_key to documents stored before it
+
+Documents are processed in _id order, ``--batch-size`` at a time. Each one is
+replaced only if it is still in the source format, so the tool can be stopped
+and rerun, and it is safe alongside a running app: readers understand both
+formats. Connection settings come from MONGO_URL and DB_NAME (backend/.env).
+
+History filtered by destination, the degraded-mode lookup and the similarity
+cache all match on ``destination_key``; documents stored before that field
+existed are invisible to them until ``--destination-keys`` has run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import bson
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+
+from recommendation_cache import make_cache_key
+from storage_codec import FACT_FIELDS, RecommendationCodec, make_facts_ref
+
+load_dotenv(Path(__file__).parent / '.env')
+
+CODECS = ["zlib", "zstd"]
+
+
+async def backfill_destination_keys(collection, config: argparse.Namespace) -> Dict[str, Any]:
+    """Set destination_key, derived from the stored query, wherever it is missing."""
+    source_filter = {"destination_key": {"$exists": False}}
+    report = {"mode": "destination_keys", "dry_run": config.dry_run, "documents": 0, "updated": 0}
+    started = time.perf_counter()
+    last_id = None
+    while not config.limit or report["documents"] < config.limit:
+        page_filter = {**source_filter, "_id": {"$gt": last_id}} if last_id is not None else source_filter
+        size = min(config.batch_size, config.limit - report["documents"]) if config.limit else config.batch_size
+        documents = await collection.find(page_filter, {"_id": 1, "query": 1}).sort("_id", 1).limit(size).to_list(length=size)
+        if not documents:
+            break
+        last_id = documents[-1]["_id"]
+        report["documents"] += len(documents)
+        if not config.dry_run:
+            result = await collection.bulk_write(
+                [
+                    UpdateOne({"_id": document["_id"], **source_filter}, {"$set": {"destination_key": make_cache_key(document["query"])[1]}})
+                    for document in documents
+                ],
+                ordered=False,
+            )
+            report["updated"] += result.modified_count
+        print(f"{report['documents']} documents processed", flush=True)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+async def migrate(config: argparse.Namespace) -> Dict[str, Any]:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    collection = db.travel_recommendations
+    if config.destination_keys:
+        try:
+            return await backfill_destination_keys(collection, config)
+        finally:
+            client.close()
+    codec = RecommendationCodec(db.recommendation_facts, codec=config.codec, level=config.level)
+    source_filter = {"payload": {"$exists": config.decode}}
+
+    report = {
+        "mode": "decode" if config.decode else "encode",
+        "codec": config.codec,
+        "dry_run": config.dry_run,
+        "documents": 0,
+        "replaced": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "distinct_facts": 0,
+        "facts_bytes": 0,
+    }
+    seen_facts = set()
+    started = time.perf_counter()
+    last_id = None
+    try:
+        while not config.limit or report["documents"] < config.limit:
+            page_filter = {**source_filter, "_id": {"$gt": last_id}} if last_id is not None else source_filter
+            size = min(config.batch_size, config.limit - report["documents"]) if config.limit else config.batch_size
+            documents = await collection.find(page_filter).sort("_id", 1).limit(size).to_list(length=size)
+            if not documents:
+                break
+            last_id = documents[-1]["_id"]
+
+            if config.decode:
+                converted = await codec.decode_many(documents)
+            elif config.dry_run:
+                converted = [codec.encode(document)[0] for document in documents]
+            else:
+                converted = await codec.encode_many(documents)
+
+            for before, after in zip(documents, converted):
+                report["bytes_before"] += len(bson.encode(before))
+                report["bytes_after"] += len(bson.encode(after))
+                if not config.decode:
+                    facts = {field: before.get(field) or {} for field in FACT_FIELDS}
+                    ref = make_facts_ref(facts)
+                    if ref not in seen_facts:
+                        seen_facts.add(ref)
+                        report["facts_bytes"] += len(bson.encode({"_id": ref, **facts}))
+            report["documents"] += len(documents)
+
+            if not config.dry_run:
+                result = await collection.bulk_write(
+                    [ReplaceOne({"_id": document["_id"], **source_filter}, document) for document in converted],
+                    ordered=False,
+                )
+                report["replaced"] += result.modified_count
+            print(f"{report['documents']} documents processed", flush=True)
+    finally:
+        client.close()
+
+    report["distinct_facts"] = len(seen_facts)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    stored = report["bytes_after"] + report["facts_bytes"]
+    report["size_ratio"] = round(report["bytes_before"] / stored, 3) if stored else 0.0
+    report["codec_stats"] = codec.stats()
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # STORAGE_CODEC=none only stops the app compressing new documents; encoding here still needs a codec
+    storage_codec = os.environ.get('STORAGE_CODEC', 'zlib')
+    parser.add_argument("--codec", default=storage_codec if storage_codec in CODECS else "zlib", choices=CODECS)
+    parser.add_argument("--level", type=int, default=None, help="compression level (codec default if omitted)")
+    parser.add_argument("--decode", action="store_true", help="convert compact documents back to plain ones")
+    parser.add_argument("--destination-keys", action="store_true", help="add destination_key where it is missing")
+    parser.add_argument("--dry-run", action="store_true", help="report sizes without writing anything")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many documents (0 = all)")
+    return parser
+
+
+def main() -> None:
+    config = build_parser().parse_args()
+    print(json.dumps(asyncio.run(migrate(config)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, time as clock, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from background import ensure_running
+from recommendation_cache import RecommendationCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def parse_windows(spec: str) -> List[Tuple[clock, clock]]:
+    """Parse "02:00-06:00,14:30-15:00" (UTC) into (start, end) pairs; windows may wrap midnight."""
+    windows = []
+    for part in filter(None, (item.strip() for item in spec.split(","))):
+        start, end = part.split("-")
+        windows.append((clock.fromisoformat(start.strip()), clock.fromisoformat(end.strip())))
+    return windows
+
+
+def in_windows(windows: List[Tuple[clock, clock]], now: datetime) -> bool:
+    if not windows:
+        return True
+    current = now.astimezone(timezone.utc).time()
+    for start, end in windows:
+        if start <= end and start <= current < end:
+            return True
+        if start > end and (current >= start or current < end):
+            return True
+    return False
+
+
+class DemandCounter:
+    """Requests served per cache key, the demand signal prewarming ranks on.
+
+    ``record`` only bumps an in-process tally. Every ``flush_interval`` seconds the
+    tallies go to ``collection`` as ``$inc``s on one document per cache key and UTC
+    day, which a TTL index drops after ``retention_days``. Every request counts,
+    cache hit or not, so entries kept warm by prewarming keep their rank.
+    """
+
+    def __init__(self, collection, flush_interval: float = 10, retention_days: float = 8):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._pending: Dict[str, List[Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushes = 0
+        self.flush_failures = 0
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        await self.collection.create_index([("day", 1), ("requests", -1)])
+
+    def start(self) -> None:
+        self._flush_task = ensure_running(self._flush_task, self._flush_loop)
+
+    async def stop(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        await self.flush()
+
+    def record(self, cache_key: str, destination: str, preferences: Optional[str]) -> None:
+        pending = self._pending.get(cache_key)
+        if pending is None:
+            self._pending[cache_key] = [1, destination, preferences or None]
+        else:
+            pending[0] += 1
+        self.recorded += 1
+        self.start()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write the pending tallies; counts that fail to write are kept for the next flush."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        expires_at = day + timedelta(days=self.retention_days)
+        results = await asyncio.gather(
+            *(
+                self.collection.update_one(
+                    {"_id": f"{cache_key}|{day.date().isoformat()}"},
+                    {
+                        "$inc": {"requests": requests},
+                        "$set": {"query": destination, "preferences": preferences},
+                        "$setOnInsert": {"cache_key": cache_key, "day": day, "expires_at": expires_at},
+                    },
+                    upsert=True,
+                )
+                for cache_key, (requests, destination, preferences) in pending.items()
+            ),
+            return_exceptions=True,
+        )
+        failures = []
+        for (cache_key, (requests, destination, preferences)), result in zip(pending.items(), results):
+            if not isinstance(result, Exception):
+                continue
+            failures.append(result)
+            current = self._pending.get(cache_key)
+            if current is None:
+                self._pending[cache_key] = [requests, destination, preferences]
+            else:
+                current[0] += requests
+        self.flushes += 1
+        if failures:
+            self.flush_failures += 1
+            logger.warning(f"Recording query demand failed for {len(failures)} keys, retrying next flush: {str(failures[0])}")
+
+    async def top(self, since: datetime, limit: int) -> List[Dict[str, Any]]:
+        """The ``limit`` cache keys with the most requests on or after ``since``'s UTC day."""
+        await self.flush()
+        pipeline = [
+            {"$match": {"day": {"$gte": since.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)}}},
+            {"$group": {
+                "_id": "$cache_key",
+                "requests": {"$sum": "$requests"},
+                "query": {"$last": "$query"},
+                "preferences": {"$last": "$preferences"},
+            }},
+            {"$sort": {"requests": -1}},
+            {"$limit": limit},
+        ]
+        return [group async for group in self.collection.aggregate(pipeline)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recorded": self.recorded,
+            "pending_keys": len(self._pending),
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "flush_interval_seconds": self.flush_interval,
+        }
+
+
+class PrewarmScheduler:
+    """Keeps the recommendation cache warm for the most requested queries.
+
+    Every ``interval`` seconds (with jitter) the scheduler asks ``demand`` for the
+    ``top_n`` cache keys served most over the last ``lookback_days`` and checks
+    their shared cache entries:
+
+    * missing entries are generated, but only inside the off-peak ``windows``;
+    * entries expiring within ``refresh_ahead`` seconds are regenerated at any time,
+      each against its own randomly shortened threshold, so a batch cached together
+      is refreshed over several cycles instead of all at once.
+
+    At most ``concurrency`` generations run at once and none start while ``busy()``
+    reports user traffic waiting for the LLM. ``warm`` does the actual generation
+    and caching; it is not a user request, so prewarming never counts as demand.
+
+    Every worker runs its own scheduler. With ``leases`` set, a worker first claims
+    the cache key there for ``lease_seconds`` and skips keys another worker holds,
+    so each entry is regenerated once per cycle however many workers there are.
+    """
+
+    def __init__(
+        self,
+        demand: DemandCounter,
+        cache: RecommendationCache,
+        warm: Callable[[str, Optional[str]], Awaitable[bool]],
+        busy: Callable[[], bool] = lambda: False,
+        top_n: int = 20,
+        lookback_days: float = 7,
+        concurrency: int = 2,
+        interval: float = 600,
+        refresh_ahead: float = 1800,
+        jitter: float = 0.2,
+        windows: Optional[List[Tuple[clock, clock]]] = None,
+        leases=None,
+        lease_seconds: float = 900,
+    ):
+        self.demand = demand
+        self.cache = cache
+        self.warm = warm
+        self.busy = busy
+        self.top_n = top_n
+        self.lookback_days = lookback_days
+        self.concurrency = concurrency
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.jitter = jitter
+        self.windows = windows or []
+        self.leases = leases
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._loop_task: Optional[asyncio.Task] = None
+        self._run_task: Optional[asyncio.Task] = None
+        self.next_run_at: Optional[datetime] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.runs = 0
+        self.generated = 0
+        self.failed = 0
+        self.leased_elsewhere = 0
+
+    async def ensure_indexes(self) -> None:
+        if self.leases is not None:
+            await self.leases.create_index("expires_at", expireAfterSeconds=0)
+
+    def start(self) -> None:
+        self._loop_task = ensure_running(self._loop_task, self._loop)
+
+    async def claim(self, cache_key: str) -> bool:
+        """Take the lease on ``cache_key`` unless another worker holds an unexpired one."""
+        if self.leases is None:
+            return True
+        now = datetime.now(timezone.utc)
+        try:
+            doc = await self.leases.find_one_and_update(
+                {"_id": cache_key, "expires_at": {"$lte": now}},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=True,
+            )
+        except Exception as e:
+            # The filter missed an existing lease, so the upsert collided with it
+            if getattr(e, "code", None) != 11000:
+                logger.warning(f"Prewarm lease for {cache_key} unavailable: {str(e)}")
+            return False
+        return doc is not None and doc.get("owner") == self.owner
+
+    async def stop(self) -> None:
+        for task in (self._loop_task, self._run_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._loop_task = self._run_task = None
+
+    @property
+    def running(self) -> bool:
+        return self._run_task is not None and not self._run_task.done()
+
+    def trigger(self, force: bool = False, reason: str = "manual") -> bool:
+        """Start a run now unless one is already in progress. ``force`` ignores windows and traffic."""
+        if self.running:
+            return False
+        self._run_task = asyncio.ensure_future(self.run(force=force, reason=reason))
+        return True
+
+    async def _loop(self) -> None:
+        while True:
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self.next_run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+            if self.trigger(reason="scheduled"):
+                try:
+                    await self._run_task
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Prewarm run failed: {str(e)}")
+
+    async def top_queries(self) -> List[Dict[str, Any]]:
+        """Most requested (query, preferences) pairs, one per cache key, busiest first."""
+        since = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+        targets = []
+        for group in await self.demand.top(since, self.top_n):
+            destination_key = make_cache_key(group["query"], group["preferences"])[1]
+            targets.append({
+                "cache_key": group["_id"],
+                "destination": group["query"],
+                "destination_key": destination_key,
+                "preferences": group["preferences"],
+                "requests": group["requests"],
+            })
+        return targets
+
+    async def run(self, force: bool = False, reason: str = "manual") -> Dict[str, Any]:
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        off_peak = force or in_windows(self.windows, now)
+        summary = {
+            "reason": reason,
+            "started_at": now.isoformat(),
+            "off_peak": off_peak,
+            "targets": 0,
+            "prewarmed": 0,
+            "refreshed": 0,
+            "fresh": 0,
+            "skipped_peak": 0,
+            "deferred_busy": 0,
+            "leased_elsewhere": 0,
+            "failed": 0,
+        }
+        self.last_run = summary
+
+        targets = await self.top_queries()
+        expiries = await self.cache.expiries([target["cache_key"] for target in targets]) if targets else {}
+        summary["targets"] = len(targets)
+
+        jobs = []
+        for target in targets:
+            expires_at = expiries.get(target["cache_key"])
+            if expires_at is None:
+                if not off_peak:
+                    summary["skipped_peak"] += 1
+                    continue
+                jobs.append((target, "prewarmed"))
+            elif (expires_at - now).total_seconds() <= self.refresh_ahead * random.uniform(1 - self.jitter, 1):
+                jobs.append((target, "refreshed"))
+            else:
+                summary["fresh"] += 1
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def execute(target: Dict[str, Any], outcome: str) -> None:
+            async with semaphore:
+                if not force and self.busy():
+                    summary["deferred_busy"] += 1
+                    return
+                if not await self.claim(target["cache_key"]):
+                    summary["leased_elsewhere"] += 1
+                    self.leased_elsewhere += 1
+                    return
+                try:
+                    ok = await self.warm(target["destination"], target["preferences"])
+                except Exception as e:
+                    logger.warning(f"Prewarming {target['destination']} failed: {str(e)}")
+                    ok = False
+                if ok:
+                    summary[outcome] += 1
+                    self.generated += 1
+                else:
+                    summary["failed"] += 1
+                    self.failed += 1
+
+        await asyncio.gather(*(execute(target, outcome) for target, outcome in jobs))
+        summary["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        summary["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self.runs += 1
+        logger.info(f"Prewarm run ({reason}): {summary}")
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "generated": self.generated,
+            "failed": self.failed,
+            "leased_elsewhere": self.leased_elsewhere,
+            "next_run_at": self.next_run_at.isoformat() if self.next_run_at else None,
+            "off_peak_now": in_windows(self.windows, datetime.now(timezone.utc)),
+            "windows": [f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in self.windows],
+            "top_n": self.top_n,
+            "concurrency": self.concurrency,
+            "refresh_ahead_seconds": self.refresh_ahead,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_destination(destination: str) -> str:
+    """Lower-case a destination and collapse punctuation/whitespace ("  Paris, France " -> "paris france")."""
+    return " ".join(_NON_WORD.sub(" ", destination.casefold()).split())
+
+
+def normalize_preferences(preferences: Optional[str]) -> str:
+    """Lower-case preferences and collapse punctuation/whitespace, keeping word order.
+
+    Order carries meaning ("avoid museums, love food" is not "love museums, avoid
+    food"); reordered requests are left to the similarity cache, which understands negation.
+    """
+    if not preferences:
+        return ""
+    return " ".join(_NON_WORD.sub(" ", preferences.casefold()).split())
+
+
+def make_cache_key(destination: str, preferences: Optional[str] = None) -> Tuple[str, str]:
+    """Return (cache_key, destination_key) for a travel query."""
+    destination_key = normalize_destination(destination)
+    raw = f"{destination_key}|{normalize_preferences(preferences)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest(), destination_key
+
+
+class TTLCache:
+    """Bounded LRU mapping where every entry also carries its own expiry time."""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def items(self):
+        return list(self._data.items())
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class RecommendationCache:
+    """Two-tier recommendation cache: in-process TTL/LRU in front of a shared Mongo collection.
+
+    Values are RecommendationResponse dicts already passed through prepare_for_mongo.
+    The Mongo tier relies on a TTL index over ``expires_at``; because the TTL monitor
+    only runs periodically, reads also filter on ``expires_at`` explicitly. Any Mongo
+    error is logged and treated as a miss so the cache never fails a request.
+
+    In-process copies live at most ``local_ttl_seconds``: ``invalidate`` can only
+    clear the tier of the worker that runs it, so other workers drop their copies
+    within that bound and then see the shared tier's answer.
+    """
+
+    def __init__(self, collection, maxsize: int = 512, ttl_seconds: int = 21600, local_ttl_seconds: float = 30):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.local_ttl_seconds = local_ttl_seconds
+        self.local = TTLCache(maxsize)
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        await self.collection.create_index("destination_key")
+
+    async def _fetch_remote(self, key: str) -> Optional[Dict[str, Any]]:
+        # Shared-tier lookup; a hit is copied into the in-process tier until it expires
+        now = datetime.now(timezone.utc)
+        try:
+            doc = await self.collection.find_one({"_id": key, "expires_at": {"$gt": now}})
+        except Exception as e:
+            logger.warning(f"Recommendation cache lookup failed: {str(e)}")
+            return None
+        if doc is None:
+            return None
+        self._keep_local(doc, now)
+        return doc["response"]
+
+    def _keep_local(self, doc: Dict[str, Any], now: datetime) -> None:
+        expires_at = doc["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self.local.set(
+            doc["_id"],
+            {"destination_key": doc.get("destination_key"), "response": doc["response"]},
+            min(self.local_ttl_seconds, (expires_at - now).total_seconds()),
+        )
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.local.get(key)
+        if entry is not None:
+            self.local_hits += 1
+            return entry["response"]
+
+        response = await self._fetch_remote(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.remote_hits += 1
+        return response
+
+    async def cached_keys(self, keys: List[str]) -> Set[str]:
+        """Which of ``keys`` are cached, in at most one shared-tier query and without
+        counting lookups. Shared-tier hits are pulled into the in-process tier, so the
+        ``get`` that usually follows is local."""
+        found = {key for key in keys if self.local.get(key) is not None}
+        missing = [key for key in keys if key not in found]
+        if not missing:
+            return found
+        now = datetime.now(timezone.utc)
+        try:
+            async for doc in self.collection.find({"_id": {"$in": missing}, "expires_at": {"$gt": now}}):
+                self._keep_local(doc, now)
+                found.add(doc["_id"])
+        except Exception as e:
+            logger.warning(f"Recommendation cache lookup failed: {str(e)}")
+        return found
+
+    async def set(self, key: str, destination_key: str, response: Dict[str, Any]) -> None:
+        self.local.set(key, {"destination_key": destination_key, "response": response}, min(self.local_ttl_seconds, self.ttl_seconds))
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "destination_key": destination_key,
+                    "response": response,
+                    "cached_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Recommendation cache write failed: {str(e)}")
+
+    async def expiries(self, keys: List[str]) -> Dict[str, datetime]:
+        """Expiry time of every live shared-tier entry among ``keys``; missing keys are not cached."""
+        now = datetime.now(timezone.utc)
+        found = {}
+        cursor = self.collection.find({"_id": {"$in": keys}, "expires_at": {"$gt": now}}, {"expires_at": 1})
+        async for doc in cursor:
+            expires_at = doc["expires_at"]
+            found[doc["_id"]] = expires_at if expires_at.tzinfo else expires_at.replace(tzinfo=timezone.utc)
+        return found
+
+    async def invalidate(self, destination_key: Optional[str] = None) -> int:
+        """Drop every entry for ``destination_key``, or the whole cache when it is None."""
+        if destination_key is None:
+            self.local.clear()
+            result = await self.collection.delete_many({})
+        else:
+            for key, (_, entry) in self.local.items():
+                if entry["destination_key"] == destination_key:
+                    self.local.pop(key)
+            result = await self.collection.delete_many({"destination_key": destination_key})
+        return result.deleted_count
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.local_hits + self.remote_hits
+        lookups = hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "remote_hits": self.remote_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "local_size": len(self.local),
+            "local_maxsize": self.local.maxsize,
+            "local_evictions": self.local.evictions,
+            "ttl_seconds": self.ttl_seconds,
+            "local_ttl_seconds": self.local_ttl_seconds,
+        }
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, AsyncContextManager, Awaitable, Callable, Deque, Dict, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+
+class LlmUnavailable(Exception):
+    """Base class for LLM calls the resilience layer gave up on."""
+
+
+class CircuitOpen(LlmUnavailable):
+    """Raised without calling the LLM while the circuit breaker is open."""
+
+
+class LlmDeadlineExceeded(LlmUnavailable):
+    """Raised when no attempt finished within the per-call deadline."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    ``failure_threshold`` failures in a row open the circuit and calls are refused
+    for ``reset_timeout`` seconds. After that a single probe is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_opened_at: Optional[datetime] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def _refresh(self) -> None:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probe_in_flight = False
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through, without claiming the half-open probe."""
+        self._refresh()
+        return self.state == "closed" or (self.state == "half_open" and not self._probe_in_flight)
+
+    def allow(self) -> bool:
+        self._refresh()
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe whose call ended without a verdict."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                self.last_opened_at = datetime.now(timezone.utc)
+                logger.warning(f"LLM circuit breaker opened after {self.consecutive_failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "times_opened": self.times_opened,
+            "last_opened_at": self.last_opened_at.isoformat() if self.last_opened_at else None,
+            "rejected": self.rejected,
+        }
+
+
+class ResilientCaller:
+    """Deadline, hedging and circuit breaking around one async LLM call.
+
+    Every call must finish within ``deadline`` seconds. With a ``slot`` (e.g. the
+    LLM pool's), each attempt runs inside it and the deadline only starts once the
+    first attempt holds one: waiting in the queue is bounded by the pool itself,
+    which raises a passthrough exception when it gives up. When hedging is on and a
+    call is still running after the observed ``hedge_quantile`` latency (at least
+    ``hedge_min_delay``, and only once ``min_samples`` latencies have been seen), a
+    second identical call is started if ``can_hedge()`` allows it; the first
+    successful result wins and the other call is cancelled. Only provider timeouts
+    and errors count against the breaker. Exceptions listed in ``passthrough`` (e.g.
+    the pool refusing work) are re-raised untouched and say nothing about provider health.
+    """
+
+    def __init__(
+        self,
+        call: Callable[[Any], Awaitable[Any]],
+        breaker: CircuitBreaker,
+        deadline: float = 25,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 2,
+        min_samples: int = 20,
+        window: int = 200,
+        can_hedge: Callable[[], bool] = lambda: True,
+        passthrough: Tuple[Type[BaseException], ...] = (),
+        slot: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+    ):
+        self.call = call
+        self.slot = slot
+        self.breaker = breaker
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.min_samples = min_samples
+        self.can_hedge = can_hedge
+        self.passthrough = passthrough
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        self.hedges_started = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        observed = ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+        return max(self.hedge_min_delay, observed)
+
+    async def _attempt(self, message: Any, acquired: asyncio.Event) -> Any:
+        if self.slot is None:
+            acquired.set()
+            return await self.call(message)
+        async with self.slot():
+            acquired.set()
+            return await self.call(message)
+
+    async def __call__(self, message: Any) -> Any:
+        if not self.breaker.allow():
+            raise CircuitOpen("LLM circuit breaker is open")
+        self.calls += 1
+        acquired = asyncio.Event()
+        first = asyncio.ensure_future(self._attempt(message, acquired))
+        attempts: Dict[asyncio.Task, bool] = {first: False}
+        hedge_delay = self.hedge_delay()
+        error: Optional[BaseException] = None
+        settled = False
+        deadline_at = float("inf")
+
+        try:
+            # The deadline covers the provider, not the queue for a slot
+            waiter = asyncio.ensure_future(acquired.wait())
+            try:
+                await asyncio.wait({first, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+            started = time.monotonic()
+            deadline_at = started + self.deadline
+
+            while attempts:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                hedge_pending = hedge_delay is not None and len(attempts) == 1
+                wait_for = min(remaining, max(0.0, started + hedge_delay - time.monotonic())) if hedge_pending else remaining
+                done, _ = await asyncio.wait(attempts, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    is_hedge = attempts.pop(task)
+                    exception = task.exception()
+                    if exception is None:
+                        self.latencies.append(time.monotonic() - started)
+                        self.successes += 1
+                        self.hedge_wins += is_hedge
+                        self.breaker.record_success()
+                        settled = True
+                        return task.result()
+                    if isinstance(exception, self.passthrough):
+                        if not is_hedge:
+                            # Our own backpressure, not a provider failure
+                            raise exception
+                    else:
+                        error = exception
+
+                if hedge_pending:
+                    # At most one hedge per call, and none once the first attempt has finished
+                    if not done and time.monotonic() < deadline_at and self.can_hedge():
+                        self.hedges_started += 1
+                        attempts[asyncio.ensure_future(self._attempt(message, asyncio.Event()))] = True
+                    hedge_delay = None
+        finally:
+            for task in attempts:
+                task.cancel()
+            if not settled and error is None and time.monotonic() < deadline_at:
+                # Cancelled by the caller or refused by the pool: no verdict on the provider
+                self.breaker.release_probe()
+
+        self.failures += 1
+        self.breaker.record_failure()
+        if error is not None:
+            raise error
+        self.deadline_exceeded += 1
+        raise LlmDeadlineExceeded(f"No LLM response within {self.deadline:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        return {
+            "deadline_seconds": self.deadline,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedging": self.hedge,
+            "hedge_delay_ms": round(delay * 1000, 3) if delay is not None else None,
+            "hedges_started": self.hedges_started,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": round(self.hedge_wins / self.hedges_started, 4) if self.hedges_started else 0.0,
+            "breaker": self.breaker.stats(),
+        }
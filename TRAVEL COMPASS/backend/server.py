@@ -1,26 +1,152 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 import uuid
 from datetime import datetime, timezone
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from urllib.parse import parse_qs
+from recommendation_cache import RecommendationCache, make_cache_key
+from singleflight import SingleFlight
+from destination_facts import DestinationFactsStore
+from gazetteer import Gazetteer, load_gazetteer, to_geographic_info
+from destination_index import DestinationIndex
+from similarity_cache import SimilarityCache
+from llm_pool import LlmClientPool, LlmPoolSaturated
+from streaming_json import OBJECT_SECTIONS, RecommendationStreamParser
+from write_behind import WriteBehindQueue
+from storage_codec import RecommendationCodec
+from lazy_mongo import LazyDatabase
+from fast_json import FastJSONResponse, dumps, extract_json, loads
+from metrics import SIZE_BUCKETS, MetricsMiddleware, MetricsRegistry
+from prewarm import DemandCounter, PrewarmScheduler, parse_windows
+from resilience import CircuitBreaker, CircuitOpen, LlmDeadlineExceeded, ResilientCaller
+from admission import AdmissionController, AdmissionMiddleware
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection. Motor is imported and the client built on first use, then kept for
+# the life of the process, so cold starts that never touch the database skip both
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = None
 
-# Create the main app without a prefix
-app = FastAPI()
+def connect_database():
+    global client
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(mongo_url)
+    # Once per process, off the request path
+    run_in_background(ensure_indexes())
+    return client[os.environ['DB_NAME']]
+
+db = LazyDatabase(connect_database)
+
+# Two-tier recommendation cache (in-process LRU + Mongo TTL collection)
+recommendation_cache = RecommendationCache(
+    db.recommendation_cache,
+    maxsize=int(os.environ.get('RECOMMENDATION_CACHE_SIZE', '512')),
+    ttl_seconds=int(os.environ.get('RECOMMENDATION_CACHE_TTL_SECONDS', '21600')),
+    # Bounds how long other workers keep serving an entry after DELETE /api/recommendations/cache
+    local_ttl_seconds=float(os.environ.get('RECOMMENDATION_CACHE_LOCAL_TTL_SECONDS', '30')),
+)
+
+# Long-lived geographic_info/climate_info per destination, so the prompt can skip them
+destination_facts = DestinationFactsStore(
+    db.destination_facts,
+    maxsize=int(os.environ.get('DESTINATION_FACTS_CACHE_SIZE', '1024')),
+    ttl_seconds=int(os.environ.get('DESTINATION_FACTS_TTL_SECONDS', '7776000')),
+    # Bounds how long other workers keep serving facts after they are invalidated
+    local_ttl_seconds=float(os.environ.get('DESTINATION_FACTS_LOCAL_TTL_SECONDS', '60')),
+)
+
+# travel_recommendations are stored as a queryable summary plus a compressed payload, with
+# geographic_info/climate_info kept once per distinct value in recommendation_facts
+recommendation_codec = RecommendationCodec(
+    db.recommendation_facts,
+    codec=os.environ.get('STORAGE_CODEC', 'zlib'),
+    level=int(os.environ['STORAGE_COMPRESSION_LEVEL']) if os.environ.get('STORAGE_COMPRESSION_LEVEL') else None,
+)
+
+# Offline gazetteer, memory-mapped once and shared by every request
+gazetteer: Optional[Gazetteer] = None
+gazetteer_loaded = False
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    global gazetteer, gazetteer_loaded
+    if not gazetteer_loaded:
+        gazetteer_loaded = True
+        try:
+            gazetteer = load_gazetteer()
+        except Exception as e:
+            logger.warning(f"Could not load gazetteer: {str(e)}")
+    return gazetteer
+
+# Typeahead over known destinations, built on first use and updated as results are stored
+destination_index = DestinationIndex()
+destination_names_loaded = False
+DESTINATION_INDEX_MAX_STORED = int(os.environ.get('DESTINATION_INDEX_MAX_STORED', '5000'))
+
+def load_destination_names():
+    # Gazetteer names are in memory already, so the first suggestion never waits on Mongo
+    global destination_names_loaded
+    if not destination_names_loaded:
+        destination_names_loaded = True
+        if get_gazetteer():
+            for name in get_gazetteer().names():
+                destination_index.add(name, canonical=True)
+
+async def load_destination_counts():
+    # Popularity of stored queries, capped to the most requested so the scan result stays bounded.
+    # Fallback results are left out: a misspelling the LLM could not answer is no suggestion
+    pipeline = [
+        {"$match": {"fallback": {"$ne": True}}},
+        {"$group": {"_id": "$query", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": DESTINATION_INDEX_MAX_STORED},
+    ]
+    try:
+        async for group in db.travel_recommendations.aggregate(pipeline):
+            if isinstance(group["_id"], str):
+                destination_index.add(group["_id"], group["count"])
+    except Exception as e:
+        logger.warning(f"Could not load destinations for suggestions: {str(e)}")
+
+# Reuses stored results for near-duplicate free-text preferences of the same destination
+similarity_cache = SimilarityCache(
+    threshold=float(os.environ.get('SIMILARITY_CACHE_THRESHOLD', '0.45')),
+    max_rows=int(os.environ.get('SIMILARITY_CACHE_MAX_ROWS', '20000')),
+)
+
+async def build_similarity_cache():
+    try:
+        cursor = db.travel_recommendations.find(
+            {"preferences": {"$nin": [None, ""]}, "fallback": {"$ne": True}},
+            {"_id": 0, "id": 1, "query": 1, "destination_key": 1, "preferences": 1},
+        ).sort([("created_at", -1), ("id", -1)]).limit(similarity_cache.max_rows)
+        documents = await cursor.to_list(length=similarity_cache.max_rows)
+    except Exception as e:
+        logger.warning(f"Could not load recommendations for the similarity cache: {str(e)}")
+        return
+    for document in reversed(documents):
+        # Documents stored before destination_key existed get it derived from their query
+        destination_key = document.get("destination_key") or make_cache_key(document["query"])[1]
+        similarity_cache.add(document["id"], destination_key, document["preferences"])
+
+# In-flight registry so concurrent identical queries share one LLM call
+recommendation_flights = SingleFlight()
+SINGLEFLIGHT_FOLLOWER_TIMEOUT = float(os.environ.get('SINGLEFLIGHT_FOLLOWER_TIMEOUT_SECONDS', '60'))
+
+# Upper bound on concurrent LLM calls started by one batch request
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '4'))
+
+# Create the main app without a prefix, responses are rendered with orjson
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -37,6 +163,39 @@ class RecommendationResponse(BaseModel):
     geographic_info: Dict[str, Any]
     climate_info: Dict[str, Any]
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Set to the reason ("circuit_open", "deadline", "error") when served without the LLM
+    degraded: Optional[str] = None
+
+class RecommendationSummary(BaseModel):
+    id: str
+    query: str
+    created_at: datetime
+    recommendation_count: int = 0
+    country: Optional[str] = None
+
+class DestinationSuggestion(BaseModel):
+    destination: str
+    match: str
+    score: float
+
+class DestinationFacts(BaseModel):
+    query: str
+    geographic_info: Dict[str, Any]
+    climate_info: Dict[str, Any] = {}
+    source: str
+
+class BatchRecommendationRequest(BaseModel):
+    queries: List[TravelQuery] = Field(..., min_length=1, max_length=50)
+
+class BatchRecommendationItem(BaseModel):
+    index: int
+    query: TravelQuery
+    cached: bool = False
+    result: Optional[RecommendationResponse] = None
+    error: Optional[str] = None
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[BatchRecommendationItem]
 
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -47,11 +206,50 @@ class StatusCheckCreate(BaseModel):
     client_name: str
 
 # Initialize AI Chat
-ai_chat = LlmChat(
-    api_key=os.environ.get('EMERGENT_LLM_KEY'),
-    session_id="travel-guide-session",
-    system_message="You are an expert travel guide and geographic information specialist. Provide comprehensive, accurate travel recommendations with detailed geographic and climate information. Always format your responses in clear, structured JSON format."
-).with_model("openai", "gpt-4o")
+SYSTEM_MESSAGE = "You are an expert travel guide and geographic information specialist. Provide comprehensive, accurate travel recommendations with detailed geographic and climate information. Always format your responses in clear, structured JSON format."
+
+def llm_chat_module():
+    # emergentintegrations pulls in the OpenAI, Google and boto SDKs, so it is imported on
+    # the first LLM call instead of at startup; later calls hit the sys.modules cache
+    from emergentintegrations.llm import chat
+    return chat
+
+def new_user_message(text: str):
+    return llm_chat_module().UserMessage(text=text)
+
+def create_llm_chat(session_id: str):
+    return llm_chat_module().LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=session_id,
+        system_message=SYSTEM_MESSAGE
+    ).with_model("openai", "gpt-4o")
+
+# Every request gets a fresh session; the pool caps concurrent LLM calls and queues the rest
+llm_pool = LlmClientPool(
+    create_llm_chat,
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '8')),
+    max_queue=int(os.environ.get('LLM_MAX_QUEUE', '32')),
+    queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '30')),
+)
+
+# Deadline, p95-based hedging and a circuit breaker around every non-streaming LLM call.
+# The deadline starts once a pool slot is held; the pool's queue timeout bounds the wait.
+# Hedges only start while the pool has a free slot and nobody is queued
+llm_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get('LLM_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.environ.get('LLM_BREAKER_RESET_SECONDS', '30')),
+)
+llm_caller = ResilientCaller(
+    llm_pool.send,
+    llm_breaker,
+    deadline=float(os.environ.get('LLM_DEADLINE_SECONDS', '25')),
+    hedge=os.environ.get('LLM_HEDGE_ENABLED', 'true').lower() == 'true',
+    hedge_quantile=float(os.environ.get('LLM_HEDGE_QUANTILE', '0.95')),
+    hedge_min_delay=float(os.environ.get('LLM_HEDGE_MIN_DELAY_SECONDS', '2')),
+    can_hedge=lambda: llm_pool.waiting == 0 and llm_pool.in_flight < llm_pool.max_concurrency,
+    passthrough=(LlmPoolSaturated,),
+    slot=llm_pool.slot,
+)
 
 # Helper function to prepare data for MongoDB
 def prepare_for_mongo(data):
@@ -65,199 +263,908 @@ def prepare_for_mongo(data):
                 data[key] = [prepare_for_mongo(item) if isinstance(item, dict) else item for item in value]
     return data
 
+# Inserts are queued and written by a background worker in insert_many batches,
+# so request latency does not include Mongo write latency
+write_queue = WriteBehindQueue(
+    db,
+    prepare=prepare_for_mongo,
+    encoders={"travel_recommendations": recommendation_codec.encode_many},
+    batch_size=int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '100')),
+    flush_interval=float(os.environ.get('WRITE_BEHIND_FLUSH_MS', '50')) / 1000,
+    max_queue=int(os.environ.get('WRITE_BEHIND_MAX_QUEUE', '10000')),
+    # Serverless instances can be frozen or dropped before a shutdown flush, so write before answering there
+    inline=os.environ.get('WRITE_BEHIND_INLINE', 'true' if os.environ.get('VERCEL') else 'false').lower() == 'true',
+)
+background_tasks = set()
+
+# In-memory indexes that used to be built at startup, now loaded once per process on first use
+warmup_tasks: Dict[str, asyncio.Task] = {}
+
+def load_once(name: str, load) -> asyncio.Task:
+    task = warmup_tasks.get(name)
+    if task is None:
+        task = warmup_tasks[name] = asyncio.ensure_future(load())
+    return task
+
+# Prometheus-style metrics served at /api/metrics; per-stage timings can also go out as Server-Timing
+metrics = MetricsRegistry()
+recommendation_results = metrics.counter("recommendations_total", "Recommendations served, by where they came from", ["source"])
+llm_parse_results = metrics.counter("llm_parse_total", "LLM responses by parse outcome", ["result"])
+llm_prompt_chars = metrics.histogram("llm_prompt_chars", "Characters sent to the LLM per call", buckets=SIZE_BUCKETS)
+llm_response_chars = metrics.histogram("llm_response_chars", "Characters received from the LLM per call", buckets=SIZE_BUCKETS)
+metrics.register_stats("recommendation_cache", recommendation_cache.stats)
+metrics.register_stats("similarity_cache", similarity_cache.stats)
+metrics.register_stats("destination_facts", destination_facts.stats)
+metrics.register_stats("singleflight", recommendation_flights.stats)
+metrics.register_stats("llm_pool", llm_pool.stats)
+metrics.register_stats("write_queue", write_queue.stats)
+metrics.register_stats("storage_codec", recommendation_codec.stats)
+metrics.register_stats("llm_resilience", llm_caller.stats)
+llm_degraded = metrics.counter("llm_degraded_total", "Responses served without the LLM, by reason and source", ["reason", "source"])
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Travel Guide API"}
 
-@api_router.post("/recommendations", response_model=RecommendationResponse)
-async def get_travel_recommendations(query: TravelQuery):
+RECOMMENDATIONS_STRUCTURE = """
+        "recommendations": [
+            {
+                "name": "Attraction/Restaurant/Activity Name",
+                "type": "attraction",
+                "description": "Clear, informative description",
+                "rating": "4.5/5",
+                "best_time_to_visit": "Best visiting time",
+                "estimated_duration": "Time needed",
+                "tips": "Practical visitor tips"
+            }
+        ]"""
+
+FACTS_STRUCTURE = """,
+        "geographic_info": {
+            "continent": "Continent Name",
+            "country": "Country Name", 
+            "region": "State/Province/Region",
+            "coordinates": "Latitude, Longitude",
+            "elevation": "Elevation above sea level",
+            "time_zone": "Time zone (e.g., GMT+9)",
+            "local_currency": "Currency name and code",
+            "languages": ["Primary language", "Secondary language"],
+            "population": "Population of city/region"
+        },
+        "climate_info": {
+            "climate_type": "Climate classification",
+            "seasons": {
+                "spring": "Spring weather description",
+                "summer": "Summer weather description", 
+                "fall": "Fall weather description",
+                "winter": "Winter weather description"
+            },
+            "average_temperatures": {
+                "summer_high": "°C (°F)",
+                "summer_low": "°C (°F)",
+                "winter_high": "°C (°F)",
+                "winter_low": "°C (°F)"
+            },
+            "rainfall": "Annual rainfall description",
+            "best_travel_months": ["Month1", "Month2", "Month3"]
+        }"""
+
+def build_recommendation_prompt(query: TravelQuery, include_facts: bool = True) -> str:
+    # Create comprehensive prompt for travel recommendations. When geographic_info and
+    # climate_info come from the destination facts store, only ask for recommendations.
+    structure = RECOMMENDATIONS_STRUCTURE + (FACTS_STRUCTURE if include_facts else "")
+    prompt = f"""
+    DESTINATION: {query.destination}
+    {f'PREFERENCES: {query.preferences}' if query.preferences else ''}
+    
+    You are a travel expert. Provide ONLY a valid JSON response (no other text) with {'comprehensive travel information' if include_facts else 'travel recommendations'} for {query.destination}. Use this exact structure:
+
+    {{{structure}
+    }}
+
+    Include 8-10 diverse recommendations (attractions, restaurants, activities, hotels). Ensure all data is accurate and current. RESPOND ONLY WITH VALID JSON.
+    """
+    return prompt
+
+def fallback_recommendation(destination: str) -> Dict[str, Any]:
+    # Structured fallback with actual destination info, used when the LLM output cannot be parsed
+    destination_parts = destination.split(',')
+    city = destination_parts[0].strip()
+    country = destination_parts[-1].strip() if len(destination_parts) > 1 else city
+    
+    ai_data = {
+        "recommendations": [
+            {
+                "name": f"Explore {city}",
+                "type": "activity",
+                "description": f"Discover the amazing attractions and culture of {city}. This vibrant destination offers unique experiences for every traveler.",
+                "rating": "4.5/5",
+                "best_time_to_visit": "Year-round",
+                "estimated_duration": "2-3 days",
+                "tips": f"Research local customs and try traditional cuisine in {city}"
+            },
+            {
+                "name": f"{city} City Center",
+                "type": "attraction",
+                "description": f"The heart of {city} with its main attractions, shopping, and dining options.",
+                "rating": "4.3/5",
+                "best_time_to_visit": "Morning to evening",
+                "estimated_duration": "Half day",
+                "tips": "Use public transportation to get around easily"
+            },
+            {
+                "name": "Local Restaurants",
+                "type": "restaurant",
+                "description": f"Experience authentic local cuisine at the best restaurants {city} has to offer.",
+                "rating": "4.4/5",
+                "best_time_to_visit": "Lunch and dinner",
+                "estimated_duration": "1-2 hours per meal",
+                "tips": "Make reservations in advance for popular spots"
+            }
+        ],
+        "geographic_info": {
+            "continent": "To be determined",
+            "country": country,
+            "region": f"{city} region",
+            "coordinates": "Available on mapping services",
+            "elevation": "Variable",
+            "time_zone": "Local time zone",
+            "local_currency": "Local currency",
+            "languages": ["Local languages"],
+            "population": f"{city} metropolitan area"
+        },
+        "climate_info": {
+            "climate_type": "Temperate",
+            "seasons": {
+                "spring": "Mild and pleasant weather",
+                "summer": "Warm and comfortable",
+                "fall": "Cool with beautiful foliage", 
+                "winter": "Cool to cold temperatures"
+            },
+            "average_temperatures": {
+                "summer_high": "25°C (77°F)",
+                "summer_low": "15°C (59°F)",
+                "winter_high": "10°C (50°F)",
+                "winter_low": "0°C (32°F)"
+            },
+            "rainfall": "Moderate throughout the year",
+            "best_travel_months": ["April", "May", "September", "October"]
+        }
+    }
+    
+    # Real coordinates, time zone and currency beat placeholders when the gazetteer knows the place
+    place = get_gazetteer().lookup(destination) if get_gazetteer() else None
+    if place is not None:
+        ai_data["geographic_info"] = {**ai_data["geographic_info"], **to_geographic_info(place)}
+    return ai_data
+
+def parse_ai_response(response: str, destination: str):
+    """Return (ai_data, used_fallback) for a raw LLM response."""
+    ai_data, repaired = extract_json(response)
+    # Only a complete object with recommendations is a clean parse; anything else is partial
+    if ai_data is not None and not repaired and isinstance(ai_data.get("recommendations"), list):
+        llm_parse_results.inc("ok")
+        return ai_data, False
+    llm_parse_results.inc("fallback" if not ai_data else "repaired" if repaired else "incomplete")
+
+    # Truncated output keeps the sections that arrived, the fallback fills the rest.
+    # Either way it counts as a fallback so it is never cached or stored as facts
+    fallback = fallback_recommendation(destination)
+    for key, value in (ai_data or {}).items():
+        if key in fallback and value and isinstance(value, type(fallback[key])):
+            fallback[key] = {**fallback[key], **value} if isinstance(value, dict) else value
+    return fallback, True
+
+def run_in_background(coro) -> None:
+    # Keep a reference so the task is not garbage collected, shutdown waits for the rest
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def cache_recommendation(recommendation: RecommendationResponse, cache_key: str, destination_key: str) -> None:
+    await recommendation_cache.set(cache_key, destination_key, prepare_for_mongo(recommendation.dict(exclude={"degraded"})))
+
+async def store_recommendation(recommendation: RecommendationResponse, cache_key: str, destination_key: str, store_in_cache: bool = True, used_fallback: bool = False, preferences: Optional[str] = None) -> None:
+    # Store in database via the write-behind queue, destination_key backs the per-destination history index,
+    # preferences and fallback let the similarity cache be rebuilt from stored documents.
+    # Degraded responses are copies or placeholders served while the LLM is down, never history
+    if recommendation.degraded:
+        return
+    await write_queue.put("travel_recommendations", {
+        **recommendation.dict(exclude={"degraded"}),
+        "destination_key": destination_key,
+        "preferences": preferences,
+        "fallback": used_fallback,
+    })
+    # In-memory indexes that have not been loaded yet will pick the document up from Mongo
+    if "destination_index" in warmup_tasks and not used_fallback:
+        destination_index.add(recommendation.query)
+    
+    # Never cache the generic fallback, the next request should retry the LLM
+    if store_in_cache and not used_fallback:
+        run_in_background(cache_recommendation(recommendation, cache_key, destination_key))
+        if "similarity_cache" in warmup_tasks:
+            similarity_cache.add(recommendation.id, destination_key, preferences)
+
+async def find_similar_recommendation(match, cache_key: str, destination_key: str) -> Optional[RecommendationResponse]:
+    # match is a (recommendation_id, similarity) pair from the similarity cache
+    if match is None:
+        return None
     try:
-        # Create comprehensive prompt for travel recommendations
-        prompt = f"""
-        DESTINATION: {query.destination}
-        {f'PREFERENCES: {query.preferences}' if query.preferences else ''}
-        
-        You are a travel expert. Provide ONLY a valid JSON response (no other text) with comprehensive travel information for {query.destination}. Use this exact structure:
-
-        {{
-            "recommendations": [
-                {{
-                    "name": "Attraction/Restaurant/Activity Name",
-                    "type": "attraction",
-                    "description": "Clear, informative description",
-                    "rating": "4.5/5",
-                    "best_time_to_visit": "Best visiting time",
-                    "estimated_duration": "Time needed",
-                    "tips": "Practical visitor tips"
-                }}
-            ],
-            "geographic_info": {{
-                "continent": "Continent Name",
-                "country": "Country Name", 
-                "region": "State/Province/Region",
-                "coordinates": "Latitude, Longitude",
-                "elevation": "Elevation above sea level",
-                "time_zone": "Time zone (e.g., GMT+9)",
-                "local_currency": "Currency name and code",
-                "languages": ["Primary language", "Secondary language"],
-                "population": "Population of city/region"
-            }},
-            "climate_info": {{
-                "climate_type": "Climate classification",
-                "seasons": {{
-                    "spring": "Spring weather description",
-                    "summer": "Summer weather description", 
-                    "fall": "Fall weather description",
-                    "winter": "Winter weather description"
-                }},
-                "average_temperatures": {{
-                    "summer_high": "°C (°F)",
-                    "summer_low": "°C (°F)",
-                    "winter_high": "°C (°F)",
-                    "winter_low": "°C (°F)"
-                }},
-                "rainfall": "Annual rainfall description",
-                "best_travel_months": ["Month1", "Month2", "Month3"]
-            }}
-        }}
-
-        Include 8-10 diverse recommendations (attractions, restaurants, activities, hotels). Ensure all data is accurate and current. RESPOND ONLY WITH VALID JSON.
-        """
-        
-        user_message = UserMessage(text=prompt)
-        response = await ai_chat.send_message(user_message)
-        
-        # Parse the AI response
-        import json
-        import re
-        
-        # Try to extract JSON from the response
+        document = await recommendation_codec.decode(await db.travel_recommendations.find_one({"id": match[0]}, {"_id": 0}))
+    except Exception as e:
+        logger.warning(f"Similar recommendation lookup failed: {str(e)}")
+        return None
+    if document is None:
+        return None
+    recommendation = RecommendationResponse(**document)
+    recommendation_results.inc("similar")
+    # Remember it under this exact key too, the next identical query skips the vector lookup
+    run_in_background(cache_recommendation(recommendation, cache_key, destination_key))
+    return recommendation
+
+async def lookup_cached_recommendation(cache_key: str, destination_key: str, preferences: Optional[str]) -> Optional[RecommendationResponse]:
+    # Exact cache first, then a stored result for near-duplicate preferences
+    cached = await recommendation_cache.get(cache_key)
+    if cached is not None:
+        recommendation_results.inc("cache")
+        return RecommendationResponse(**cached)
+    if not preferences:
+        return None
+    # The first lookups miss while stored preferences load in the background
+    load_once("similarity_cache", build_similarity_cache)
+    return await find_similar_recommendation(similarity_cache.lookup(destination_key, preferences), cache_key, destination_key)
+
+def merge_destination_facts(ai_data: Dict[str, Any], facts: Optional[Dict[str, Any]], destination_key: str, used_fallback: bool) -> Dict[str, Any]:
+    # Stored facts win over whatever the model produced (or the fallback placeholders);
+    # freshly generated facts are remembered for the next request
+    if facts is not None:
+        return {**ai_data, **facts}
+    if not used_fallback and ai_data.get("geographic_info") and ai_data.get("climate_info"):
+        run_in_background(destination_facts.set(destination_key, ai_data["geographic_info"], ai_data["climate_info"]))
+    return ai_data
+
+async def degraded_recommendation(query: TravelQuery, facts: Optional[Dict[str, Any]], reason: str) -> RecommendationResponse:
+    # Without the LLM: the cached answer, else the newest stored real answer for the destination,
+    # else the gazetteer-backed fallback. It is marked degraded, so it is never cached or stored
+    cache_key, destination_key = make_cache_key(query.destination, query.preferences)
+    ai_data, source = await recommendation_cache.get(cache_key), "cache"
+    if ai_data is None:
         try:
-            # First try direct JSON parsing
-            ai_data = json.loads(response)
-        except json.JSONDecodeError:
-            try:
-                # Look for JSON within the response text
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    ai_data = json.loads(json_match.group())
-                else:
-                    raise ValueError("No JSON found in response")
-            except (json.JSONDecodeError, ValueError):
-                # If all parsing fails, create a structured fallback with actual destination info
-                destination_parts = query.destination.split(',')
-                city = destination_parts[0].strip()
-                country = destination_parts[-1].strip() if len(destination_parts) > 1 else city
-                
-                ai_data = {
-                    "recommendations": [
-                        {
-                            "name": f"Explore {city}",
-                            "type": "activity",
-                            "description": f"Discover the amazing attractions and culture of {city}. This vibrant destination offers unique experiences for every traveler.",
-                            "rating": "4.5/5",
-                            "best_time_to_visit": "Year-round",
-                            "estimated_duration": "2-3 days",
-                            "tips": f"Research local customs and try traditional cuisine in {city}"
-                        },
-                        {
-                            "name": f"{city} City Center",
-                            "type": "attraction",
-                            "description": f"The heart of {city} with its main attractions, shopping, and dining options.",
-                            "rating": "4.3/5",
-                            "best_time_to_visit": "Morning to evening",
-                            "estimated_duration": "Half day",
-                            "tips": "Use public transportation to get around easily"
-                        },
-                        {
-                            "name": "Local Restaurants",
-                            "type": "restaurant",
-                            "description": f"Experience authentic local cuisine at the best restaurants {city} has to offer.",
-                            "rating": "4.4/5",
-                            "best_time_to_visit": "Lunch and dinner",
-                            "estimated_duration": "1-2 hours per meal",
-                            "tips": "Make reservations in advance for popular spots"
-                        }
-                    ],
-                    "geographic_info": {
-                        "continent": "To be determined",
-                        "country": country,
-                        "region": f"{city} region",
-                        "coordinates": "Available on mapping services",
-                        "elevation": "Variable",
-                        "time_zone": "Local time zone",
-                        "local_currency": "Local currency",
-                        "languages": ["Local languages"],
-                        "population": f"{city} metropolitan area"
-                    },
-                    "climate_info": {
-                        "climate_type": "Temperate",
-                        "seasons": {
-                            "spring": "Mild and pleasant weather",
-                            "summer": "Warm and comfortable",
-                            "fall": "Cool with beautiful foliage", 
-                            "winter": "Cool to cold temperatures"
-                        },
-                        "average_temperatures": {
-                            "summer_high": "25°C (77°F)",
-                            "summer_low": "15°C (59°F)",
-                            "winter_high": "10°C (50°F)",
-                            "winter_low": "0°C (32°F)"
-                        },
-                        "rainfall": "Moderate throughout the year",
-                        "best_travel_months": ["April", "May", "September", "October"]
-                    }
-                }
-        
-        # Create response object
+            ai_data, source = await recommendation_codec.decode(await db.travel_recommendations.find_one(
+                {"destination_key": destination_key, "fallback": {"$ne": True}}, {"_id": 0}, sort=HISTORY_SORT
+            )), "history"
+        except Exception as e:
+            logger.warning(f"Degraded history lookup failed: {str(e)}")
+    if ai_data is None:
+        ai_data, source = merge_destination_facts(fallback_recommendation(query.destination), facts, destination_key, True), "fallback"
+    llm_degraded.inc(reason, source)
+    recommendation_results.inc("degraded")
+    # A cached or stored answer keeps its id so it can be fetched again; the fallback gets a new one
+    identity = {field: ai_data[field] for field in ("id", "created_at") if field in ai_data}
+    return RecommendationResponse(
+        query=query.destination,
+        recommendations=ai_data.get("recommendations", []),
+        geographic_info=ai_data.get("geographic_info", {}),
+        climate_info=ai_data.get("climate_info", {}),
+        degraded=reason,
+        **identity,
+    )
+
+async def request_recommendation(query: TravelQuery):
+    # LLM call and parse only, returns (recommendation, used_fallback) without storing anything
+    destination_key = make_cache_key(query.destination)[1]
+    with metrics.stage("facts_lookup"):
+        facts = await destination_facts.get(destination_key)
+    user_message = new_user_message(build_recommendation_prompt(query, include_facts=facts is None))
+    llm_prompt_chars.observe(len(user_message.text))
+    try:
+        with metrics.stage("llm"):
+            response = await llm_caller(user_message)
+    except LlmPoolSaturated:
+        raise
+    except Exception as e:
+        reason = "circuit_open" if isinstance(e, CircuitOpen) else "deadline" if isinstance(e, LlmDeadlineExceeded) else "error"
+        if reason != "circuit_open":
+            logger.warning(f"LLM call for {query.destination} failed ({reason}), serving degraded data: {str(e)}")
+        return await degraded_recommendation(query, facts, reason), True
+    llm_response_chars.observe(len(response))
+    with metrics.stage("parse"):
+        ai_data, used_fallback = parse_ai_response(response, query.destination)
+        ai_data = merge_destination_facts(ai_data, facts, destination_key, used_fallback)
+    
+    # Create response object
+    with metrics.stage("validate"):
         recommendation = RecommendationResponse(
             query=query.destination,
             recommendations=ai_data.get("recommendations", []),
             geographic_info=ai_data.get("geographic_info", {}),
             climate_info=ai_data.get("climate_info", {})
         )
-        
-        # Store in database
-        recommendation_dict = prepare_for_mongo(recommendation.dict())
-        await db.travel_recommendations.insert_one(recommendation_dict)
-        
+    recommendation_results.inc("fallback" if used_fallback else "llm")
+    return recommendation, used_fallback
+
+async def generate_recommendation(query: TravelQuery, cache_key: str, destination_key: str, store_in_cache: bool = True) -> RecommendationResponse:
+    recommendation, used_fallback = await request_recommendation(query)
+    with metrics.stage("store"):
+        await store_recommendation(recommendation, cache_key, destination_key, store_in_cache, used_fallback, query.preferences)
+    return recommendation
+
+async def prewarm_recommendation(destination: str, preferences: Optional[str]) -> bool:
+    # Cache only, never history or demand: prewarming is not a user request. A separate
+    # flight key keeps users from joining a result that has no history document
+    query = TravelQuery(destination=destination, preferences=preferences)
+    cache_key, destination_key = make_cache_key(query.destination, query.preferences)
+    cached = []
+
+    async def generate():
+        recommendation, used_fallback = await request_recommendation(query)
+        if not used_fallback:
+            await cache_recommendation(recommendation, cache_key, destination_key)
+            cached.append(recommendation.id)
         return recommendation
-    
+
+    await recommendation_flights.do(f"prewarm:{cache_key}", generate, follower_timeout=SINGLEFLIGHT_FOLLOWER_TIMEOUT)
+    return bool(cached)
+
+# Requests served per cache key, hits included, counted in process and flushed as $inc batches
+query_demand = DemandCounter(
+    db.query_demand,
+    flush_interval=float(os.environ.get('DEMAND_FLUSH_SECONDS', '10')),
+    retention_days=float(os.environ.get('PREWARM_LOOKBACK_DAYS', '7')) + 1,
+)
+metrics.register_stats("query_demand", query_demand.stats)
+
+# Refreshes the most requested cache entries before they expire and fills missing ones off-peak.
+# Workers lease each key in prewarm_leases first so only one of them regenerates it per cycle
+prewarm_scheduler = PrewarmScheduler(
+    query_demand,
+    recommendation_cache,
+    prewarm_recommendation,
+    busy=lambda: llm_pool.waiting > 0,
+    top_n=int(os.environ.get('PREWARM_TOP_N', '20')),
+    lookback_days=float(os.environ.get('PREWARM_LOOKBACK_DAYS', '7')),
+    concurrency=int(os.environ.get('PREWARM_CONCURRENCY', '2')),
+    interval=float(os.environ.get('PREWARM_INTERVAL_SECONDS', '600')),
+    refresh_ahead=float(os.environ.get('PREWARM_REFRESH_AHEAD_SECONDS', '1800')),
+    jitter=float(os.environ.get('PREWARM_JITTER', '0.2')),
+    windows=parse_windows(os.environ.get('PREWARM_WINDOWS', '02:00-06:00')),
+    leases=db.prewarm_leases,
+    lease_seconds=float(os.environ.get('PREWARM_LEASE_SECONDS', '900')),
+)
+PREWARM_ENABLED = os.environ.get('PREWARM_ENABLED', 'true').lower() == 'true'
+metrics.register_stats("prewarm", prewarm_scheduler.stats)
+
+# Admission control for the LLM-backed routes: per-client token buckets (API key or IP) and an
+# in-flight budget sized to what the LLM pool can run and queue. ADMISSION_SHARED=true shares
+# the buckets across workers through Mongo
+admission_controller = AdmissionController(
+    rate=float(os.environ.get('ADMISSION_RATE_PER_SECOND', '0.5')),
+    burst=float(os.environ.get('ADMISSION_BURST', '10')),
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', str(llm_pool.max_concurrency + llm_pool.max_queue))),
+    overload_retry_after=float(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', '2')),
+    max_clients=int(os.environ.get('ADMISSION_MAX_CLIENTS', '10000')),
+    shared=db.rate_limits if os.environ.get('ADMISSION_SHARED', 'false').lower() == 'true' else None,
+    sync_interval=float(os.environ.get('ADMISSION_SYNC_SECONDS', '1')),
+)
+ADMISSION_ROUTES = {
+    ("POST", "/api/recommendations"),
+    ("POST", "/api/recommendations/stream"),
+    ("POST", "/api/recommendations/batch"),
+}
+metrics.register_stats("admission", admission_controller.stats)
+
+async def admission_cost(scope: Dict[str, Any], body: bytes) -> float:
+    # LLM calls the request may need: none while the breaker is open (it is answered with
+    # degraded data at once) or when every query it asks for is already cached
+    if not llm_breaker.available():
+        return 0
+    try:
+        data = loads(body)
+        queries = data["queries"] if scope["path"].rstrip("/").endswith("/batch") else [data]
+        keys = {make_cache_key(query["destination"], query.get("preferences"))[0] for query in queries}
+    except (ValueError, TypeError, KeyError, AttributeError):
+        # Malformed bodies are rejected by validation, charge them like one call
+        return 1
+    # FastAPI binds the last of repeated query parameters, so price the request on that one
+    if parse_qs(scope.get("query_string", b"").decode("latin-1")).get("cache", ["use"])[-1] != "use":
+        return len(keys)
+    return len(keys - await recommendation_cache.cached_keys(list(keys)))
+
+@api_router.post("/recommendations", response_model=RecommendationResponse)
+async def get_travel_recommendations(query: TravelQuery, cache: Literal["use", "bypass", "refresh"] = "use"):
+    # cache=use reads and writes the cache, cache=refresh skips the read but stores
+    # the new result, cache=bypass leaves the cache untouched
+    cache_key, destination_key = make_cache_key(query.destination, query.preferences)
+    query_demand.record(cache_key, query.destination, query.preferences)
+    if cache == "use":
+        with metrics.stage("cache_lookup"):
+            cached = await lookup_cached_recommendation(cache_key, destination_key, query.preferences)
+        if cached is not None:
+            return cached
+
+    try:
+        # Concurrent identical queries share one LLM call, parse and insert
+        return await recommendation_flights.do(
+            cache_key,
+            lambda: generate_recommendation(query, cache_key, destination_key, store_in_cache=cache != "bypass"),
+            follower_timeout=SINGLEFLIGHT_FOLLOWER_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out waiting for in-flight recommendation for {query.destination}")
+        raise HTTPException(status_code=504, detail="Timed out waiting for travel recommendations")
+    except LlmPoolSaturated as e:
+        logger.warning(f"Rejecting travel recommendations request: {str(e)}")
+        raise HTTPException(status_code=503, detail="Recommendation service is busy, please retry shortly")
     except Exception as e:
         logger.error(f"Error getting travel recommendations: {str(e)}")
         raise HTTPException(status_code=500, detail="Error generating travel recommendations")
 
+def format_stream_event(event: str, data: Any, stream_format: str) -> str:
+    payload = jsonable_encoder(data)
+    if stream_format == "ndjson":
+        return dumps({"event": event, "data": payload}) + "\n"
+    return f"event: {event}\ndata: {dumps(payload)}\n\n"
+
+@api_router.post("/recommendations/stream")
+async def stream_travel_recommendations(
+    query: TravelQuery,
+    cache: Literal["use", "bypass", "refresh"] = "use",
+    stream_format: Literal["sse", "ndjson"] = Query("sse", alias="format"),
+):
+    # Emits one "recommendation" event per item, then "geographic_info" and "climate_info",
+    # each as soon as it closes in the LLM output, and finally "complete" with the stored response
+    cache_key, destination_key = make_cache_key(query.destination, query.preferences)
+    query_demand.record(cache_key, query.destination, query.preferences)
+    cached = await lookup_cached_recommendation(cache_key, destination_key, query.preferences) if cache == "use" else None
+    if cached is None and not llm_breaker.available():
+        # Provider is failing: answer at once instead of streaming a doomed call
+        cached = await degraded_recommendation(query, await destination_facts.get(destination_key), "circuit_open")
+
+    async def events():
+        if cached is not None:
+            recommendation = cached
+            for item in recommendation.recommendations:
+                yield format_stream_event("recommendation", item, stream_format)
+            yield format_stream_event("geographic_info", recommendation.geographic_info, stream_format)
+            yield format_stream_event("climate_info", recommendation.climate_info, stream_format)
+            yield format_stream_event("complete", recommendation, stream_format)
+            return
+
+        parser = RecommendationStreamParser()
+        streamed = {"recommendations": []}
+        try:
+            # Known destination facts go out before the first LLM token
+            facts = await destination_facts.get(destination_key)
+            if facts is not None:
+                for section in OBJECT_SECTIONS:
+                    streamed[section] = facts[section]
+                    yield format_stream_event(section, facts[section], stream_format)
+
+            user_message = new_user_message(build_recommendation_prompt(query, include_facts=facts is None))
+            llm_prompt_chars.observe(len(user_message.text))
+            async for chunk in llm_pool.stream_message(user_message):
+                for event, value in parser.feed(chunk):
+                    if event == "recommendation":
+                        streamed["recommendations"].append(value)
+                    elif event in streamed:
+                        # Already sent from the facts store
+                        continue
+                    else:
+                        streamed[event] = value
+                    yield format_stream_event(event, value, stream_format)
+
+            llm_response_chars.observe(parser.length)
+            ai_data, used_fallback = parse_ai_response(parser.text(), query.destination)
+            recommendation_results.inc("fallback" if used_fallback else "llm")
+            if used_fallback and streamed["recommendations"]:
+                # Truncated output: keep what already reached the client, fill the rest
+                ai_data = {**ai_data, **streamed}
+            ai_data = merge_destination_facts(ai_data, facts, destination_key, used_fallback)
+
+            # Emit anything the incremental parser never saw close
+            if not streamed["recommendations"]:
+                for item in ai_data.get("recommendations", []):
+                    yield format_stream_event("recommendation", item, stream_format)
+            for section in OBJECT_SECTIONS:
+                if section not in streamed:
+                    yield format_stream_event(section, ai_data.get(section, {}), stream_format)
+
+            recommendation = RecommendationResponse(
+                query=query.destination,
+                recommendations=ai_data.get("recommendations", []),
+                geographic_info=ai_data.get("geographic_info", {}),
+                climate_info=ai_data.get("climate_info", {})
+            )
+            await store_recommendation(recommendation, cache_key, destination_key, cache != "bypass", used_fallback, query.preferences)
+            yield format_stream_event("complete", recommendation, stream_format)
+        except LlmPoolSaturated as e:
+            logger.warning(f"Rejecting streamed travel recommendations request: {str(e)}")
+            yield format_stream_event("error", {"detail": "Recommendation service is busy, please retry shortly"}, stream_format)
+        except Exception as e:
+            logger.error(f"Error streaming travel recommendations: {str(e)}")
+            yield format_stream_event("error", {"detail": "Error generating travel recommendations"}, stream_format)
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api_router.post("/recommendations/batch", response_model=BatchRecommendationResponse)
+async def get_batch_recommendations(
+    batch: BatchRecommendationRequest,
+    cache: Literal["use", "bypass", "refresh"] = "use",
+    stream: bool = False,
+):
+    # Cache hits resolve immediately, misses fan out to the LLM at most BATCH_MAX_CONCURRENCY
+    # at a time, and the write-behind queue groups everything generated into insert_many batches.
+    # stream=true returns NDJSON items in completion order instead of one JSON body.
+    keys = [make_cache_key(q.destination, q.preferences) for q in batch.queries]
+    groups: Dict[str, List[int]] = {}
+    for index, (cache_key, _) in enumerate(keys):
+        groups.setdefault(cache_key, []).append(index)
+        query_demand.record(cache_key, batch.queries[index].destination, batch.queries[index].preferences)
+
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    # One vectorized nearest-neighbour pass for the whole batch
+    similar = {}
+    if cache == "use":
+        candidates = [(cache_key, indices[0]) for cache_key, indices in groups.items() if batch.queries[indices[0]].preferences]
+        load_once("similarity_cache", build_similarity_cache)
+        matches = similarity_cache.lookup_many([(keys[i][1], batch.queries[i].preferences) for _, i in candidates])
+        similar = {cache_key: match for (cache_key, _), match in zip(candidates, matches)}
+
+    async def resolve(cache_key: str, indices: List[int]) -> List[BatchRecommendationItem]:
+        query = batch.queries[indices[0]]
+        recommendation, cached, error = None, False, None
+        if cache == "use":
+            hit = await recommendation_cache.get(cache_key)
+            if hit is not None:
+                recommendation = RecommendationResponse(**hit)
+            else:
+                recommendation = await find_similar_recommendation(similar.get(cache_key), cache_key, keys[indices[0]][1])
+            cached = recommendation is not None
+        if recommendation is None:
+            try:
+                async with semaphore:
+                    recommendation, used_fallback = await request_recommendation(query)
+                await store_recommendation(recommendation, cache_key, keys[indices[0]][1], cache != "bypass", used_fallback, query.preferences)
+            except LlmPoolSaturated:
+                error = "Recommendation service is busy, please retry shortly"
+            except Exception as e:
+                logger.error(f"Error getting batch travel recommendations for {query.destination}: {str(e)}")
+                error = "Error generating travel recommendations"
+        return [
+            BatchRecommendationItem(index=i, query=batch.queries[i], cached=cached, result=recommendation, error=error)
+            for i in indices
+        ]
+
+    tasks = [asyncio.ensure_future(resolve(cache_key, indices)) for cache_key, indices in groups.items()]
+
+    if stream:
+        async def lines():
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    for item in await next_done:
+                        yield dumps(jsonable_encoder(item)) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = [item for items in await asyncio.gather(*tasks) for item in items]
+    return BatchRecommendationResponse(results=sorted(results, key=lambda item: item.index))
+
+@api_router.get("/recommendations/cache/stats")
+async def get_recommendation_cache_stats():
+    return {
+        **recommendation_cache.stats(),
+        "in_flight": recommendation_flights.stats(),
+        "similarity": similarity_cache.stats(),
+    }
+
+@api_router.delete("/recommendations/cache")
+async def invalidate_recommendation_cache(destination: Optional[str] = None):
+    # Drop every cached entry for a destination (any preferences), or the whole cache
+    try:
+        destination_key = make_cache_key(destination)[1] if destination else None
+        deleted = await recommendation_cache.invalidate(destination_key)
+        return {"deleted": deleted}
+    except Exception as e:
+        logger.error(f"Error invalidating recommendation cache: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error invalidating recommendation cache")
+
+@api_router.get("/persistence/stats")
+async def get_persistence_stats():
+    return write_queue.stats()
+
+@api_router.get("/storage/stats")
+async def get_storage_stats():
+    return recommendation_codec.stats()
+
+@api_router.get("/metrics")
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api_router.get("/prewarm")
+async def get_prewarm_status():
+    return prewarm_scheduler.stats()
+
+@api_router.post("/prewarm", status_code=202)
+async def trigger_prewarm(response: Response, force: bool = False):
+    # force=true ignores the off-peak windows and waiting user traffic
+    started = prewarm_scheduler.trigger(force=force)
+    if not started:
+        response.status_code = 409
+    return {"started": started, **prewarm_scheduler.stats()}
+
+@api_router.get("/admission")
+async def get_admission_stats():
+    return admission_controller.stats()
+
+@api_router.get("/llm/resilience")
+async def get_llm_resilience_stats():
+    return llm_caller.stats()
+
+@api_router.get("/llm/pool")
+async def get_llm_pool_stats():
+    return llm_pool.stats()
+
+def to_stored_timestamp(value: str) -> str:
+    # Stored timestamps are prepare_for_mongo isoformat strings, so normalize to match.
+    # A "+hh:mm" offset pasted into a URL unencoded arrives as " hh:mm"
+    value = value.strip()
+    if len(value) > 6 and value[-6] == " ":
+        value = f"{value[:-6]}+{value[-5:]}"
+    return datetime.fromisoformat(value).astimezone(timezone.utc).isoformat()
+
+def to_cursor_timestamp(value: Any) -> str:
+    # "Z" instead of "+00:00" keeps cursors URL-safe; to_stored_timestamp reads both
+    value = value.isoformat() if isinstance(value, datetime) else str(value)
+    return f"{value[:-6]}Z" if value.endswith("+00:00") else value
+
+def keyset_filter(before: Optional[str], field: str = "created_at") -> Dict[str, Any]:
+    # Cursors are "<timestamp>,<id>" taken from the last item of the previous page
+    if not before:
+        return {}
+    timestamp, _, last_id = before.partition(",")
+    try:
+        timestamp = to_stored_timestamp(timestamp)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor, expected '<{field}>,<id>'")
+    if not last_id:
+        return {field: {"$lt": timestamp}}
+    return {"$or": [
+        {field: {"$lt": timestamp}},
+        {field: timestamp, "id": {"$lt": last_id}},
+    ]}
+
+def combine_filters(*conditions: Dict[str, Any]) -> Dict[str, Any]:
+    conditions = [condition for condition in conditions if condition]
+    return {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+
+def history_filter(before: Optional[str], destination: Optional[str]) -> Dict[str, Any]:
+    # Documents stored before destination_key existed only match after migrate_storage.py --destination-keys
+    return combine_filters(
+        keyset_filter(before),
+        {"destination_key": make_cache_key(destination)[1]} if destination else {},
+    )
+
+def set_next_cursor(response: Response, page: List[Dict[str, Any]], limit: int, field: str = "created_at") -> None:
+    if len(page) == limit:
+        last = page[-1]
+        response.headers["X-Next-Cursor"] = f"{to_cursor_timestamp(last[field])},{last['id']}"
+
+HISTORY_SORT = [("created_at", -1), ("id", -1)]
+
+@api_router.get("/destinations/suggest", response_model=List[DestinationSuggestion])
+async def suggest_destinations(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(8, ge=1, le=20)):
+    # Ranked prefix matches first, then trigram matches for misspellings ("tokio" -> "Tokyo").
+    # Stored query counts load in the background and only refine the ranking once they arrive
+    load_destination_names()
+    load_once("destination_index", load_destination_counts)
+    return destination_index.suggest(q, limit)
+
+@api_router.get("/destinations/facts", response_model=DestinationFacts)
+async def get_destination_facts(destination: str):
+    # No-LLM mode: stored facts when we have them, otherwise the offline gazetteer
+    facts = await destination_facts.get(make_cache_key(destination)[1])
+    if facts is not None:
+        return DestinationFacts(query=destination, source="facts_store", **facts)
+    place = get_gazetteer().lookup(destination) if get_gazetteer() else None
+    if place is None:
+        raise HTTPException(status_code=404, detail="Destination not found")
+    return DestinationFacts(query=destination, geographic_info=to_geographic_info(place), source="gazetteer")
+
+@api_router.get("/destinations/facts/stats")
+async def get_destination_facts_stats():
+    return destination_facts.stats()
+
+@api_router.delete("/destinations/facts")
+async def invalidate_destination_facts(destination: Optional[str] = None):
+    # Drop stored facts for one destination, or all of them, so the next request regenerates them
+    try:
+        destination_key = make_cache_key(destination)[1] if destination else None
+        deleted = await destination_facts.invalidate(destination_key)
+        return {"deleted": deleted}
+    except Exception as e:
+        logger.error(f"Error invalidating destination facts: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error invalidating destination facts")
+
 @api_router.get("/recommendations/history", response_model=List[RecommendationResponse])
-async def get_recommendation_history():
+async def get_recommendation_history(
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    destination: Optional[str] = None,
+):
     try:
-        recommendations = await db.travel_recommendations.find().sort("created_at", -1).limit(10).to_list(length=10)
-        return [RecommendationResponse(**rec) for rec in recommendations]
+        cursor = db.travel_recommendations.find(history_filter(before, destination), {"_id": 0, "destination_key": 0})
+        with metrics.stage("history_find"):
+            recommendations = await cursor.sort(HISTORY_SORT).limit(limit).to_list(length=limit)
+        set_next_cursor(response, recommendations, limit)
+        with metrics.stage("history_decode"):
+            recommendations = await recommendation_codec.decode_many(recommendations)
+        with metrics.stage("history_validate"):
+            return [RecommendationResponse(**rec) for rec in recommendations]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting recommendation history: {str(e)}")
         raise HTTPException(status_code=500, detail="Error retrieving recommendation history")
 
+@api_router.get("/recommendations/history/summary", response_model=List[RecommendationSummary])
+async def get_recommendation_history_summary(
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    destination: Optional[str] = None,
+):
+    # Lightweight list view: only ids, query, timestamps and counts leave the database. Compact
+    # documents carry the count and country in their summary, older ones are computed
+    try:
+        pipeline = [
+            {"$match": history_filter(before, destination)},
+            {"$sort": dict(HISTORY_SORT)},
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,
+                "id": 1,
+                "query": 1,
+                "created_at": 1,
+                "recommendation_count": {"$ifNull": ["$recommendation_count", {"$size": {"$ifNull": ["$recommendations", []]}}]},
+                "country": {"$ifNull": ["$country", "$geographic_info.country"]},
+            }},
+        ]
+        with metrics.stage("history_summary_aggregate"):
+            summaries = await db.travel_recommendations.aggregate(pipeline).to_list(length=limit)
+        set_next_cursor(response, summaries, limit)
+        with metrics.stage("history_validate"):
+            return [RecommendationSummary(**summary) for summary in summaries]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting recommendation history summary: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving recommendation history")
+
+@api_router.get("/recommendations/{recommendation_id}", response_model=RecommendationResponse)
+async def get_recommendation(recommendation_id: str):
+    try:
+        recommendation = await recommendation_codec.decode(
+            await db.travel_recommendations.find_one({"id": recommendation_id}, {"_id": 0, "destination_key": 0})
+        )
+    except Exception as e:
+        logger.error(f"Error getting recommendation {recommendation_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving recommendation")
+    if recommendation is None:
+        raise HTTPException(status_code=404, detail="Recommendation not found")
+    return RecommendationResponse(**recommendation)
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
-    status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(prepare_for_mongo(status_obj.dict()))
+    with metrics.stage("status_validate"):
+        status_obj = StatusCheck(**status_dict)
+    with metrics.stage("status_enqueue"):
+        await write_queue.put("status_checks", status_obj.dict())
     return status_obj
 
+STATUS_SORT = [("timestamp", -1), ("id", -1)]
+STATUS_BUCKETS = {"minute": 16, "hour": 13, "day": 10}
+
+def status_filter(before: Optional[str], client_name: Optional[str]) -> Dict[str, Any]:
+    return combine_filters(keyset_filter(before, "timestamp"), {"client_name": client_name} if client_name else {})
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    client_name: Optional[str] = None,
+):
+    # Newest first; follow X-Next-Cursor instead of losing everything past the first page
+    cursor = db.status_checks.find(status_filter(before, client_name), {"_id": 0})
+    with metrics.stage("status_find"):
+        status_checks = await cursor.sort(STATUS_SORT).limit(limit).to_list(length=limit)
+    set_next_cursor(response, status_checks, limit, "timestamp")
+    with metrics.stage("status_validate"):
+        return [StatusCheck(**status_check) for status_check in status_checks]
+
+@api_router.get("/status/stream")
+async def stream_status_checks(before: Optional[str] = None, limit: Optional[int] = Query(None, ge=1), client_name: Optional[str] = None):
+    # NDJSON straight off the Motor cursor: documents are serialized as they arrive, no Pydantic
+    # round trip and no cap other than the optional limit. Stored timestamps are already strings.
+    cursor = db.status_checks.find(status_filter(before, client_name), {"_id": 0}).sort(STATUS_SORT).batch_size(500)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    async def lines():
+        async for status_check in cursor:
+            yield dumps(status_check, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@api_router.get("/status/aggregate")
+async def aggregate_status_checks(
+    bucket: Literal["minute", "hour", "day"] = "hour",
+    since: Optional[str] = None,
+    client_name: Optional[str] = None,
+):
+    # Checks per client_name per time bucket, computed in Mongo. Timestamps are UTC isoformat
+    # strings, so a bucket is simply a prefix of the string.
+    match = {"client_name": client_name} if client_name else {}
+    if since:
+        try:
+            match["timestamp"] = {"$gte": to_stored_timestamp(since)}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid 'since' timestamp")
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"client_name": "$client_name", "bucket": {"$substr": ["$timestamp", 0, STATUS_BUCKETS[bucket]]}},
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"_id.bucket": 1, "_id.client_name": 1}},
+    ]
+    try:
+        groups = await db.status_checks.aggregate(pipeline).to_list(length=None)
+    except Exception as e:
+        logger.error(f"Error aggregating status checks: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error aggregating status checks")
+    return [
+        {"client_name": group["_id"]["client_name"], "bucket": group["_id"]["bucket"], "count": group["count"]}
+        for group in groups
+    ]
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Inside CORS, so browsers can read the 429/503 rejections and their Retry-After
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission_controller,
+    routes=ADMISSION_ROUTES,
+    cost=admission_cost,
+    # Proxies in front of the app that append to X-Forwarded-For; 0 keys clients on the socket address
+    trusted_proxies=int(os.environ.get('ADMISSION_TRUSTED_PROXIES', '0')),
+    # Only issued API keys get their own bucket, unknown ones are keyed by address
+    api_keys=[key.strip() for key in os.environ.get('ADMISSION_API_KEYS', '').split(',') if key.strip()],
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
+)
+
+# Outermost, so latency covers CORS handling too; SERVER_TIMING=true adds the per-stage header
+app.add_middleware(
+    MetricsMiddleware,
+    registry=metrics,
+    server_timing=os.environ.get('SERVER_TIMING', 'false').lower() == 'true',
 )
 
 # Configure logging
@@ -267,6 +1174,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def ensure_indexes():
+    # History pages walk (created_at, id) backwards; per-destination lookups use destination_key
+    try:
+        await db.travel_recommendations.create_index(HISTORY_SORT)
+        await db.travel_recommendations.create_index("id")
+        await db.travel_recommendations.create_index([("destination_key", 1), ("created_at", -1)])
+        await db.status_checks.create_index(STATUS_SORT)
+        await db.status_checks.create_index([("client_name", 1), ("timestamp", -1)])
+        await recommendation_cache.ensure_indexes()
+        await destination_facts.ensure_indexes()
+        await admission_controller.ensure_indexes()
+        await query_demand.ensure_indexes()
+        await prewarm_scheduler.ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Could not create database indexes: {str(e)}")
+
+@app.on_event("startup")
+async def startup_db_client():
+    # Only cheap bookkeeping here: the database client, LLM SDK, gazetteer and in-memory
+    # indexes are all loaded on first use so a cold start serves its first request sooner
+    write_queue.start()
+    if PREWARM_ENABLED:
+        prewarm_scheduler.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    # Drain pending cache writes and queued inserts before the client goes away
+    await prewarm_scheduler.stop()
+    await admission_controller.stop()
+    await query_demand.stop()
+    if background_tasks or warmup_tasks:
+        await asyncio.gather(*background_tasks, *warmup_tasks.values(), return_exceptions=True)
+    await write_queue.stop()
+    if client is not None:
+        client.close()
@@ -0,0 +1,235 @@
+import math
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# numpy is imported when the first vector is built, not when the app starts
+np = None
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+# Filler words that say nothing about what a traveller wants. "with" is filler, "without" is not
+STOPWORDS = frozenset(
+    "a an and are at be but by do for from i i'm im in into is it like love me my of on or our "
+    "so some the to us very want we with would "
+    "activities activity enjoy experience experiences friendly getaway good great holiday "
+    "ideas interested nice place places prefer really spot spots things travel traveling "
+    "travelling trip trips vacation weekend".split()
+)
+
+# Words that flip the meaning of the next term: "non vegetarian", "without kids", "no museums"
+NEGATIONS = frozenset("no not non without avoid avoiding except never none nothing".split())
+
+# Words travellers use interchangeably, mapped to one term so they count as the same feature
+SYNONYMS = {
+    word: term
+    for term, words in {
+        "budget": "budget cheap affordable inexpensive frugal",
+        "food": "food eat eating cuisine culinary dining dine restaurant foodie gastronomy",
+        "museum": "museum gallery exhibition exhibit",
+        "hike": "hike hiking trek trekking trail",
+        "kid": "kid child children family toddler",
+        "nightlife": "nightlife bar club clubbing party partying pub",
+        "beach": "beach seaside coast coastal",
+        "luxury": "luxury luxurious upscale fancy premium",
+        "history": "history historic historical heritage ancient",
+        "shopping": "shopping shop boutique mall",
+        "nature": "nature outdoor outdoors wildlife",
+        "relax": "relax relaxing relaxation spa wellness chill",
+        "romantic": "romantic romance couple honeymoon",
+        "vegetarian": "vegetarian veggie",
+    }.items()
+    for word in words.split()
+}
+
+
+def _stem(word: str) -> str:
+    # Plurals only: enough for "museums"/"museum" without mangling place names
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def analyze(preferences: Optional[str]) -> Tuple[List[str], str]:
+    """(features, negation signature) of free-text preferences.
+
+    A negated term becomes its own "!term" feature and is also listed in the
+    signature; two preferences can only match when their signatures are equal.
+    """
+    text = (preferences or "").casefold().replace("n't", " not")
+    features: List[str] = []
+    negated: List[str] = []
+    negate = False
+    for word in _NON_WORD.sub(" ", text).split():
+        if word in NEGATIONS:
+            negate = True
+            continue
+        if word in STOPWORDS:
+            continue
+        term = SYNONYMS.get(word) or SYNONYMS.get(_stem(word)) or _stem(word)
+        if negate:
+            negated.append(term)
+            term = f"!{term}"
+            negate = False
+        features.append(term)
+    return features, "|".join(sorted(set(negated)))
+
+
+def _load_numpy() -> None:
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+class SimilarityCache:
+    """Nearest-neighbour reuse of stored recommendations for near-duplicate preferences.
+
+    Preferences are vectorized locally, with no network calls: stemmed words with
+    common synonyms folded together (see ``analyze``), hashed into ``dimensions``
+    buckets (crc32, so stable across processes) and weighted by TF-IDF at query time
+    from incrementally maintained document frequencies. Rows live in one
+    preallocated float32 matrix used as a ring buffer of the most recent
+    ``max_rows`` results. Candidates must share the normalized destination exactly;
+    only preferences are compared, by cosine similarity over that destination's rows.
+    The matrix is allocated on the first ``add``, so an idle cache costs neither
+    memory nor the numpy import.
+
+    Similar is not enough to reuse an answer: at least ``min_coverage`` of each
+    side's IDF-weighted terms must also appear on the other side, so "luxury food"
+    never reuses "cheap food", and negated terms must match exactly, so
+    "vegetarian food" never reuses "non vegetarian food".
+    """
+
+    def __init__(self, threshold: float = 0.45, dimensions: int = 4096, max_rows: int = 20000, min_coverage: float = 1.0):
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.dimensions = dimensions
+        self.max_rows = max_rows
+        self._matrix = None
+        self._df = None
+        self._ids: List[Optional[str]] = []
+        self._signatures: List[str] = []
+        self._row_destination: List[Optional[str]] = []
+        self._rows: Dict[str, List[int]] = defaultdict(list)
+        self._next_row = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def vectorize(self, preferences: Optional[str]) -> "np.ndarray":
+        return self._encode(preferences)[0]
+
+    def _encode(self, preferences: Optional[str]) -> Tuple["np.ndarray", str]:
+        _load_numpy()
+        features, signature = analyze(preferences)
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if features:
+            buckets = np.fromiter((zlib.crc32(f.encode("utf-8")) % self.dimensions for f in features), dtype=np.int64, count=len(features))
+            np.add.at(vector, buckets, 1.0)
+        return vector, signature
+
+    def _grow(self) -> None:
+        if self._matrix is None:
+            rows, current = min(self.max_rows, 1024), 0
+            self._df = np.zeros(self.dimensions, dtype=np.float32)
+        else:
+            rows, current = min(self._matrix.shape[0] * 2, self.max_rows), self._matrix.shape[0]
+        matrix = np.zeros((rows, self.dimensions), dtype=np.float32)
+        if current:
+            matrix[:current] = self._matrix
+        extra = rows - current
+        self._ids.extend([None] * extra)
+        self._signatures.extend([""] * extra)
+        self._row_destination.extend([None] * extra)
+        self._matrix = matrix
+
+    def add(self, recommendation_id: str, destination_key: str, preferences: Optional[str]) -> None:
+        vector, signature = self._encode(preferences)
+        if not vector.any():
+            return
+        if self._matrix is None or self._next_row >= self._matrix.shape[0] and self._matrix.shape[0] < self.max_rows:
+            self._grow()
+        row = self._next_row % self.max_rows
+
+        previous = self._row_destination[row]
+        if previous is not None:
+            # Ring buffer is full: forget the oldest row
+            self._rows[previous].remove(row)
+            if not self._rows[previous]:
+                del self._rows[previous]
+            self._df -= self._matrix[row] > 0
+        else:
+            self.size += 1
+
+        self._matrix[row] = vector
+        self._df += vector > 0
+        self._ids[row] = recommendation_id
+        self._signatures[row] = signature
+        self._row_destination[row] = destination_key
+        self._rows[destination_key].append(row)
+        self._next_row = row + 1
+
+    def _idf(self) -> "np.ndarray":
+        return np.log((1.0 + self.size) / (1.0 + self._df)) + 1.0
+
+    def lookup_many(self, queries: Sequence[Tuple[str, Optional[str]]]) -> List[Optional[Tuple[str, float]]]:
+        """Best (recommendation_id, similarity) at or above the threshold for each (destination_key, preferences)."""
+        results: List[Optional[Tuple[str, float]]] = [None] * len(queries)
+        by_destination: Dict[str, List[int]] = defaultdict(list)
+        for position, (destination_key, _) in enumerate(queries):
+            if destination_key in self._rows:
+                by_destination[destination_key].append(position)
+
+        if by_destination:
+            idf = self._idf()
+            for destination_key, positions in by_destination.items():
+                rows = self._rows[destination_key]
+                row_terms = (self._matrix[rows] > 0).astype(np.float32)
+                candidates = self._matrix[rows] * idf
+                candidates /= np.linalg.norm(candidates, axis=1, keepdims=True) + 1e-12
+                encoded = [self._encode(queries[p][1]) for p in positions]
+                raw = np.stack([vector for vector, _ in encoded])
+                batch = raw * idf
+                batch /= np.linalg.norm(batch, axis=1, keepdims=True) + 1e-12
+                similarities = batch @ candidates.T
+                # Share of each side's term weight the other side also asks for
+                query_terms = (raw > 0).astype(np.float32)
+                query_weight, row_weight = query_terms * idf, row_terms * idf
+                query_covered = (query_weight @ row_terms.T) / (query_weight.sum(axis=1, keepdims=True) + 1e-12)
+                row_covered = (query_terms @ row_weight.T) / (row_weight.sum(axis=1)[None, :] + 1e-12)
+                similarities[np.minimum(query_covered, row_covered) < self.min_coverage - 1e-4] = -1.0
+                # Different negations mean different requests, however much text they share
+                row_signatures = np.array([self._signatures[row] for row in rows], dtype=object)
+                query_signatures = np.array([signature for _, signature in encoded], dtype=object)
+                similarities[query_signatures[:, None] != row_signatures[None, :]] = -1.0
+                best = similarities.argmax(axis=1)
+                for position, column, row_scores in zip(positions, best, similarities):
+                    score = float(row_scores[column])
+                    if score >= self.threshold and not math.isnan(score):
+                        results[position] = (self._ids[rows[column]], score)
+
+        found = sum(result is not None for result in results)
+        self.hits += found
+        self.misses += len(queries) - found
+        return results
+
+    def lookup(self, destination_key: str, preferences: Optional[str]) -> Optional[Tuple[str, float]]:
+        return self.lookup_many([(destination_key, preferences)])[0]
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "rows": self.size,
+            "destinations": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold,
+            "min_coverage": self.min_coverage,
+        }
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) starts ``fn`` as its own task; callers that
+    arrive while it is running (followers) await the same task and receive the same
+    result or exception. Waiters are shielded from each other: a caller that is
+    cancelled or times out only stops waiting, and the shared task is cancelled only
+    once nobody is waiting for it any more.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.follower_timeouts = 0
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], follower_timeout: Optional[float] = None) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self.leaders += 1
+            timeout = None
+        else:
+            self.followers += 1
+            timeout = follower_timeout
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        except asyncio.TimeoutError:
+            self.follower_timeouts += 1
+            raise
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception as retrieved when every waiter already gave up
+        if not flight.task.cancelled() and flight.task.exception() is not None and flight.waiters == 0:
+            logger.debug(f"Single-flight call for {key} failed with no waiters: {flight.task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "follower_timeouts": self.follower_timeouts,
+        }
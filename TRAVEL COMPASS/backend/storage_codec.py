@@ -0,0 +1,232 @@
+"""Compact storage format for travel_recommendations documents.
+
+A stored recommendation keeps only a small queryable summary as plain fields
+(id, query, created_at, destination_key, preferences, fallback,
+recommendation_count, country). Everything else is serialized and compressed
+into one binary ``payload`` field, except geographic_info/climate_info: those
+are nearly identical for every query about a city, so they go to a separate
+content-addressed collection once and documents keep a ``facts_ref`` to them.
+
+Sorting, filtering, aggregation and list views only ever touch the summary;
+``decode``/``decode_many`` rebuild the full document when one is requested.
+Documents written before this format (no ``payload``) are read as they are, and
+migrate_storage.py converts them in place.
+
+zlib is always available; ``codec="zstd"`` needs the optional zstandard package.
+"""
+import hashlib
+import json
+import logging
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fast_json import loads, orjson
+from recommendation_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the payload layout changes; decode dispatches on it
+STORAGE_FORMAT = 1
+
+SUMMARY_FIELDS = ("id", "query", "created_at", "destination_key", "preferences", "fallback")
+FACT_FIELDS = ("geographic_info", "climate_info")
+CODEC_FIELDS = ("format", "codec", "payload", "facts_ref", "recommendation_count", "country")
+
+# Facts never change under a given ref, so cached copies only leave through the LRU
+FACTS_CACHE_TTL = 86400
+
+
+def _to_bytes(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _canonical_bytes(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def make_facts_ref(facts: Dict[str, Any]) -> str:
+    """Content address of a {geographic_info, climate_info} pair: equal facts share one ref."""
+    return hashlib.sha1(_canonical_bytes(facts)).hexdigest()
+
+
+def get_compressor(codec: str, level: Optional[int] = None) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """(compress, decompress) for "zlib" or "zstd"."""
+    if codec == "zlib":
+        zlib_level = 6 if level is None else level
+        return (lambda data: zlib.compress(data, zlib_level)), zlib.decompress
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("codec 'zstd' needs the zstandard package") from None
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        decompressor = zstandard.ZstdDecompressor()
+        # Frames carry their content size, so no max_output_size is needed
+        return compressor.compress, decompressor.decompress
+    raise ValueError(f"Unknown storage codec: {codec}")
+
+
+def is_encoded(document: Dict[str, Any]) -> bool:
+    return "payload" in document
+
+
+class RecommendationCodec:
+    """Encodes recommendation documents into the compact format and decodes them back.
+
+    ``codec`` is "zlib", "zstd" or "none"; "none" keeps writing plain documents
+    (decoding still understands both). Facts live in ``facts_collection`` keyed by
+    their content hash; refs already written by this process are remembered so a
+    batch only upserts facts it has not seen yet. If a facts write fails the facts
+    are kept inline in the payload instead, so no document ever points at nothing.
+    """
+
+    def __init__(self, facts_collection, codec: str = "zlib", level: Optional[int] = None, facts_cache_size: int = 1024):
+        self.facts_collection = facts_collection
+        self.codec = codec
+        self.level = level
+        self._compressors: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+        if codec != "none":
+            self._compressors[codec] = get_compressor(codec, level)
+        self.facts = TTLCache(facts_cache_size)
+        self.encoded = 0
+        self.decoded = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.facts_written = 0
+        self.facts_fetched = 0
+        self.facts_missing = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.codec != "none"
+
+    def _compressor(self, codec: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+        if codec not in self._compressors:
+            self._compressors[codec] = get_compressor(codec)
+        return self._compressors[codec]
+
+    def encode(self, document: Dict[str, Any], inline_facts: bool = False) -> Tuple[Dict[str, Any], Optional[Tuple[str, Dict[str, Any]]]]:
+        """Return (stored document, (facts_ref, facts) to persist or None). Expects prepare_for_mongo output."""
+        facts = {field: document.get(field) or {} for field in FACT_FIELDS}
+        payload = {key: value for key, value in document.items() if key not in SUMMARY_FIELDS and key != "_id"}
+        ref = None
+        if not inline_facts:
+            ref = make_facts_ref(facts)
+            for field in FACT_FIELDS:
+                payload.pop(field, None)
+
+        raw = _to_bytes(payload)
+        compressed = self._compressor(self.codec)[0](raw)
+        self.encoded += 1
+        self.bytes_in += len(raw)
+        self.bytes_out += len(compressed)
+
+        stored = {key: document[key] for key in SUMMARY_FIELDS if key in document}
+        if "_id" in document:
+            stored["_id"] = document["_id"]
+        stored.update({
+            "recommendation_count": len(document.get("recommendations") or []),
+            "country": facts["geographic_info"].get("country"),
+            "format": STORAGE_FORMAT,
+            "codec": self.codec,
+            "facts_ref": ref,
+            "payload": compressed,
+        })
+        return stored, (ref, facts) if ref is not None else None
+
+    async def encode_many(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Encode a batch, writing any facts it references that are not stored yet."""
+        if not self.enabled:
+            return documents
+        encoded = [self.encode(document) for document in documents]
+
+        pending = {}
+        for _, facts in encoded:
+            if facts is not None and self.facts.get(facts[0]) is None:
+                pending[facts[0]] = facts[1]
+        failed = set()
+        for ref, facts in pending.items():
+            try:
+                await self.facts_collection.update_one(
+                    {"_id": ref},
+                    {"$setOnInsert": {**facts, "created_at": datetime.now(timezone.utc)}},
+                    upsert=True,
+                )
+                self.facts.set(ref, facts, FACTS_CACHE_TTL)
+                self.facts_written += 1
+            except Exception as e:
+                logger.warning(f"Storing shared destination facts failed, keeping them inline: {str(e)}")
+                failed.add(ref)
+
+        if not failed:
+            return [stored for stored, _ in encoded]
+        return [
+            self.encode(document, inline_facts=True)[0] if facts is not None and facts[0] in failed else stored
+            for document, (stored, facts) in zip(documents, encoded)
+        ]
+
+    def _expand(self, document: Dict[str, Any], facts: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if document.get("format") != STORAGE_FORMAT:
+            raise ValueError(f"Unsupported storage format {document.get('format')!r} for recommendation {document.get('id')}")
+        payload = loads(self._compressor(document["codec"])[1](bytes(document["payload"])))
+        self.decoded += 1
+        decoded = {key: value for key, value in document.items() if key not in CODEC_FIELDS}
+        decoded.update(payload)
+        if document.get("facts_ref") is not None:
+            decoded.update(facts or {field: {} for field in FACT_FIELDS})
+        return decoded
+
+    async def _load_facts(self, refs: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        missing = []
+        for ref in refs:
+            facts = self.facts.get(ref)
+            if facts is None:
+                missing.append(ref)
+            else:
+                found[ref] = facts
+        if missing:
+            async for doc in self.facts_collection.find({"_id": {"$in": missing}}):
+                facts = {field: doc.get(field) or {} for field in FACT_FIELDS}
+                self.facts.set(doc["_id"], facts, FACTS_CACHE_TTL)
+                found[doc["_id"]] = facts
+                self.facts_fetched += 1
+            for ref in missing:
+                if ref not in found:
+                    self.facts_missing += 1
+                    logger.warning(f"Shared destination facts {ref} are missing, serving empty facts")
+        return found
+
+    async def decode_many(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Full documents for a page of stored ones, fetching all referenced facts in one query."""
+        refs = list({document["facts_ref"] for document in documents if is_encoded(document) and document.get("facts_ref")})
+        facts = await self._load_facts(refs) if refs else {}
+        return [
+            self._expand(document, facts.get(document.get("facts_ref"))) if is_encoded(document) else document
+            for document in documents
+        ]
+
+    async def decode(self, document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if document is None or not is_encoded(document):
+            return document
+        return (await self.decode_many([document]))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "codec": self.codec,
+            "format": STORAGE_FORMAT,
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "payload_bytes_raw": self.bytes_in,
+            "payload_bytes_stored": self.bytes_out,
+            "compression_ratio": round(self.bytes_in / self.bytes_out, 3) if self.bytes_out else 0.0,
+            "facts_written": self.facts_written,
+            "facts_fetched": self.facts_fetched,
+            "facts_missing": self.facts_missing,
+            "facts_cached": len(self.facts),
+        }
@@ -0,0 +1,108 @@
+from typing import Any, List, Optional, Tuple
+
+from fast_json import loads
+
+OBJECT_SECTIONS = ("geographic_info", "climate_info")
+
+
+class RecommendationStreamParser:
+    """Incremental scanner for the recommendation JSON as it streams out of the LLM.
+
+    Feed it raw text chunks; it returns ``(event, value)`` pairs as soon as a
+    value closes: ``("recommendation", item)`` for each element of the top-level
+    ``recommendations`` array, and ``("geographic_info", {...})`` /
+    ``("climate_info", {...})`` for those sections. Text before the first ``{``
+    (code fences, preambles) and after the top-level object closes is ignored.
+    Every character is scanned once; only completed values are decoded.
+    """
+
+    def __init__(self):
+        self.buffer: List[str] = []
+        self.length = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.done = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._value_depth = 0
+        self._value_event: Optional[str] = None
+
+    def text(self) -> str:
+        return "".join(self.buffer)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        offset = self.length
+        self.buffer.append(chunk)
+        self.length += len(chunk)
+        if self.done:
+            return events
+
+        for i, ch in enumerate(chunk):
+            pos = offset + i
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self._last_string = self._slice(self._string_start, pos)
+                continue
+
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self.depth = 1
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self._string_start = pos + 1
+            elif ch == ":" and self.depth == 1:
+                self._key = self._last_string
+            elif ch == "," and self.depth == 1:
+                self._key = None
+            elif ch in "{[":
+                self.depth += 1
+                if self._value_start is None:
+                    if self.depth == 3 and ch == "{" and self._key == "recommendations":
+                        self._open_value(pos, "recommendation")
+                    elif self.depth == 2 and ch == "{" and self._key in OBJECT_SECTIONS:
+                        self._open_value(pos, self._key)
+            elif ch in "}]":
+                if self._value_start is not None and self.depth == self._value_depth:
+                    event = self._close_value(pos)
+                    if event is not None:
+                        events.append(event)
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+                    break
+        return events
+
+    def _open_value(self, pos: int, event: str) -> None:
+        self._value_start = pos
+        self._value_depth = self.depth
+        self._value_event = event
+
+    def _close_value(self, pos: int) -> Optional[Tuple[str, Any]]:
+        raw = self._slice(self._value_start, pos + 1)
+        event = self._value_event
+        self._value_start = None
+        self._value_event = None
+        try:
+            return event, loads(raw)
+        except ValueError:
+            return None
+
+    def _slice(self, start: int, end: int) -> str:
+        # Chunks are small and values short-lived, so joining on demand is cheap
+        if len(self.buffer) > 1:
+            self.buffer = ["".join(self.buffer)]
+        return self.buffer[0][start:end]
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from background import ensure_running
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Background pipeline that batches Mongo inserts off the request path.
+
+    ``enqueue`` never awaits the database: documents go onto a bounded asyncio
+    queue and a single worker drains it, grouping them per collection into
+    ``insert_many`` calls of up to ``batch_size`` documents or whatever arrived
+    within ``flush_interval`` seconds. ``prepare`` (e.g. prepare_for_mongo) runs
+    in the worker rather than in the handler, and so do the per-collection
+    ``encoders`` (e.g. the compact storage codec), which get each batch just
+    before ``insert_many``. When the queue is full the write is dropped and
+    counted instead of blocking the caller.
+
+    With ``inline`` (for serverless hosts, where nothing guarantees the shutdown
+    flush runs) ``put`` skips the queue and returns only after ``insert_many``,
+    so a write the API has acknowledged is not left in memory.
+    """
+
+    def __init__(
+        self,
+        database,
+        prepare: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        encoders: Optional[Dict[str, Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]]] = None,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        max_queue: int = 10000,
+        inline: bool = False,
+    ):
+        self.database = database
+        self.inline = inline
+        self.prepare = prepare
+        self.encoders = encoders or {}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue(max_queue)
+        self._worker: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    def start(self) -> None:
+        self._worker = ensure_running(self._worker, self._run)
+
+    def enqueue(self, collection: str, document: Dict[str, Any]) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait((collection, document))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"Write-behind queue full, dropping write to {collection}")
+            return False
+        self.enqueued += 1
+        return True
+
+    async def put(self, collection: str, document: Dict[str, Any]) -> bool:
+        """``enqueue``, or with ``inline`` write the document before returning."""
+        if not self.inline:
+            return self.enqueue(collection, document)
+        self.enqueued += 1
+        await self._write([(collection, document)])
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                # Give the window a chance to fill unless a full batch is already waiting
+                if self._queue.qsize() < self.batch_size - 1:
+                    await asyncio.sleep(self.flush_interval)
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        started = time.perf_counter()
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for collection, document in batch:
+            try:
+                if self.prepare is not None:
+                    document = self.prepare(document)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Write-behind could not prepare a document for {collection}: {str(e)}")
+                continue
+            grouped.setdefault(collection, []).append(document)
+        for collection, documents in grouped.items():
+            try:
+                if collection in self.encoders:
+                    documents = await self.encoders[collection](documents)
+                await self.database[collection].insert_many(documents, ordered=False)
+                self.written += len(documents)
+            except Exception as e:
+                self.failed += len(documents)
+                logger.error(f"Write-behind insert into {collection} failed: {str(e)}")
+            self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    async def flush(self) -> None:
+        """Write out everything queued so far."""
+        if self._worker is not None and not self._worker.done():
+            await self._queue.join()
+            return
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def stop(self) -> None:
+        """Flush pending writes and stop the worker (used from the shutdown hook)."""
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "inline": self.inline,
+        }
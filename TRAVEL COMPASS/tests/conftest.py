@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# The backend is a flat set of modules run from its own directory, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Importing server opens no database connection, it only needs the settings
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "travel_compass_test")
+os.environ.setdefault("PREWARM_ENABLED", "false")
@@ -0,0 +1,140 @@
+import asyncio
+
+import server
+from admission import AdmissionController, AdmissionMiddleware, api_key_digest, client_key
+
+ISSUED = frozenset({api_key_digest(b"issued-key")})
+
+
+def make_scope(headers=(), client=("203.0.113.7", 5000), path="/api/recommendations"):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "query_string": b"",
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        "client": client,
+    }
+
+
+def test_issued_api_key_gets_its_own_bucket():
+    key = client_key(make_scope([("x-api-key", "issued-key")]), api_keys=ISSUED)
+    assert key == "key:" + api_key_digest(b"issued-key")[:16]
+
+
+def test_unknown_api_keys_fall_back_to_the_address():
+    scopes = [make_scope([("x-api-key", f"made-up-{i}")]) for i in range(3)]
+    assert {client_key(scope, api_keys=ISSUED) for scope in scopes} == {"ip:203.0.113.7"}
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies():
+    scope = make_scope([("x-forwarded-for", "198.51.100.1")])
+    assert client_key(scope) == "ip:203.0.113.7"
+
+
+def test_forwarded_for_uses_the_hop_the_trusted_proxy_appended():
+    # The client put 198.51.100.1 there itself; the proxy appended the real address
+    scope = make_scope([("x-forwarded-for", "198.51.100.1, 192.0.2.44")])
+    assert client_key(scope, trusted_proxies=1) == "ip:192.0.2.44"
+    scope = make_scope([("x-forwarded-for", "198.51.100.1, 192.0.2.44, 10.0.0.2")])
+    assert client_key(scope, trusted_proxies=2) == "ip:192.0.2.44"
+
+
+def run_request(middleware, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b'{"destination": "Lisbon"}', "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+def test_overload_is_shed_before_the_cost_lookup():
+    costs = []
+    reached = []
+
+    async def cost(scope, body):
+        costs.append(body)
+        return 0
+
+    async def app(scope, receive, send):
+        reached.append(scope["path"])
+
+    controller = AdmissionController(rate=0, max_in_flight=1)
+    middleware = AdmissionMiddleware(app, controller, {("POST", "/api/recommendations")}, cost=cost)
+
+    run_request(middleware, make_scope())
+    assert (costs, reached) == ([b'{"destination": "Lisbon"}'], ["/api/recommendations"])
+
+    controller.in_flight = 1
+    sent = run_request(middleware, make_scope())
+    assert sent[0]["status"] == 503
+    assert (b"retry-after", b"2") in sent[0]["headers"]
+    assert len(costs) == 1 and len(reached) == 1
+    assert controller.stats()["overloaded"] == 1
+
+
+def test_rate_limit_applies_per_client():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    controller = AdmissionController(rate=0.001, burst=1)
+    middleware = AdmissionMiddleware(app, controller, {("POST", "/api/recommendations")})
+    assert run_request(middleware, make_scope())[0]["status"] == 200
+    assert run_request(middleware, make_scope([("x-api-key", "made-up")]))[0]["status"] == 429
+    assert run_request(middleware, make_scope(client=("203.0.113.8", 5000)))[0]["status"] == 200
+
+
+def test_cost_uses_the_cache_mode_fastapi_binds(monkeypatch):
+    async def cached_keys(keys):
+        return set(keys)
+
+    monkeypatch.setattr(server.recommendation_cache, "cached_keys", cached_keys)
+    body = b'{"destination": "Lisbon"}'
+
+    def cost(query_string):
+        scope = {**make_scope(), "query_string": query_string}
+        return asyncio.run(server.admission_cost(scope, body))
+
+    assert cost(b"") == 0
+    assert cost(b"cache=refresh") == 1
+    # The handler sees cache=refresh here and calls the LLM, so this must not price as a hit
+    assert cost(b"cache=use&cache=refresh") == 1
+    assert cost(b"cache=refresh&cache=use") == 0
+
+
+def test_client_over_its_limit_is_refused_before_pricing():
+    costs = []
+
+    async def cost(scope, body):
+        costs.append(body)
+        return 1
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    controller = AdmissionController(rate=0.001, burst=1)
+    middleware = AdmissionMiddleware(app, controller, {("POST", "/api/recommendations")}, cost=cost)
+    assert run_request(middleware, make_scope())[0]["status"] == 200
+    assert run_request(middleware, make_scope())[0]["status"] == 429
+    assert len(costs) == 1
+
+
+def test_batch_is_priced_with_one_cache_query(monkeypatch):
+    lookups = []
+
+    async def cached_keys(keys):
+        lookups.append(sorted(keys))
+        return {server.make_cache_key("Lisbon")[0]}
+
+    monkeypatch.setattr(server.recommendation_cache, "cached_keys", cached_keys)
+    body = b'{"queries": [{"destination": "Lisbon"}, {"destination": "Kyoto"}, {"destination": "Oslo"}, {"destination": "kyoto"}]}'
+    scope = make_scope(path="/api/recommendations/batch")
+    assert asyncio.run(server.admission_cost(scope, body)) == 2
+    assert len(lookups) == 1 and len(lookups[0]) == 3
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+from pydantic import ValidationError
+
+import server
+
+
+class FakeQueue:
+    def __init__(self):
+        self.documents = []
+
+    async def put(self, collection, document):
+        self.documents.append(document)
+        return True
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    """Destinations sent to the LLM; "Atlantis" fails and "Kyoto" is already cached."""
+    calls = []
+
+    async def request_recommendation(query):
+        calls.append(query.destination)
+        if query.destination == "Atlantis":
+            raise RuntimeError("model returned nothing")
+        return server.RecommendationResponse(query=query.destination, recommendations=[], geographic_info={}, climate_info={}), False
+
+    async def cached(cache_key):
+        if cache_key == server.make_cache_key("Kyoto")[0]:
+            return server.RecommendationResponse(query="Kyoto", recommendations=[], geographic_info={}, climate_info={}).dict()
+        return None
+
+    monkeypatch.setattr(server, "request_recommendation", request_recommendation)
+    monkeypatch.setattr(server.recommendation_cache, "get", cached)
+    monkeypatch.setattr(server.query_demand, "record", lambda *args: None)
+    monkeypatch.setattr(server, "write_queue", FakeQueue())
+    monkeypatch.setattr(server, "warmup_tasks", {})
+    return calls
+
+
+def batch(*destinations):
+    return server.BatchRecommendationRequest(queries=[{"destination": destination} for destination in destinations])
+
+
+def test_duplicate_queries_share_one_generation(generated):
+    response = asyncio.run(server.get_batch_recommendations(batch("Lisbon", "lisbon ", "Oslo", "LISBON"), cache="use"))
+    assert generated.count("Lisbon") == 1 and len(generated) == 2
+    results = response.results
+    assert [item.index for item in results] == [0, 1, 2, 3]
+    assert results[0].result.id == results[1].result.id == results[3].result.id != results[2].result.id
+    assert len(server.write_queue.documents) == 2
+
+
+def test_errors_are_reported_per_item(generated):
+    response = asyncio.run(server.get_batch_recommendations(batch("Kyoto", "Atlantis", "Oslo"), cache="use"))
+    kyoto, atlantis, oslo = response.results
+    assert kyoto.cached and kyoto.result.query == "Kyoto" and kyoto.error is None
+    assert atlantis.result is None and atlantis.error == "Error generating travel recommendations"
+    assert not oslo.cached and oslo.result.query == "Oslo" and oslo.error is None
+    assert generated == ["Atlantis", "Oslo"]
+
+
+def test_streamed_items_cover_every_query(generated):
+    async def scenario():
+        response = await server.get_batch_recommendations(batch("Kyoto", "Atlantis", "Oslo", "kyoto"), cache="use", stream=True)
+        return [json.loads(line) async for line in response.body_iterator]
+
+    items = asyncio.run(scenario())
+    assert sorted(item["index"] for item in items) == [0, 1, 2, 3]
+    assert [item["index"] for item in items if item["error"]] == [1]
+
+
+def test_batches_hold_at_most_50_queries():
+    assert len(batch(*[f"City {index}" for index in range(50)]).queries) == 50
+    with pytest.raises(ValidationError):
+        batch(*[f"City {index}" for index in range(51)])
+    with pytest.raises(ValidationError):
+        batch()
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import server
+from resilience import CircuitOpen
+
+
+class FakeQueue:
+    def __init__(self):
+        self.documents = []
+
+    async def put(self, collection, document):
+        self.documents.append(document)
+        return True
+
+
+class FakeHistory:
+    def __init__(self, document=None):
+        self.document = document
+
+    async def find_one(self, query, projection=None, sort=None):
+        return dict(self.document) if self.document else None
+
+
+class FakeDatabase:
+    def __init__(self, history):
+        self.travel_recommendations = history
+
+
+def degrade(monkeypatch, stored=None):
+    async def unavailable(message):
+        raise CircuitOpen("circuit open")
+
+    async def missing(key):
+        return None
+
+    monkeypatch.setattr(server, "new_user_message", lambda text: SimpleNamespace(text=text))
+    monkeypatch.setattr(server, "llm_caller", unavailable)
+    monkeypatch.setattr(server, "write_queue", FakeQueue())
+    monkeypatch.setattr(server, "db", FakeDatabase(FakeHistory(stored)))
+    monkeypatch.setattr(server.recommendation_cache, "get", missing)
+    monkeypatch.setattr(server.destination_facts, "get", missing)
+
+
+def generate(destination):
+    query = server.TravelQuery(destination=destination)
+    cache_key, destination_key = server.make_cache_key(destination)
+    return asyncio.run(server.generate_recommendation(query, cache_key, destination_key))
+
+
+def test_degraded_responses_are_marked_and_not_stored(monkeypatch):
+    degrade(monkeypatch)
+    recommendation = generate("Lisbon")
+    assert recommendation.degraded == "circuit_open"
+    assert server.write_queue.documents == []
+
+
+def test_degraded_copy_of_a_stored_answer_keeps_its_id(monkeypatch):
+    stored = server.RecommendationResponse(
+        query="Lisbon", recommendations=[{"name": "Belem Tower"}], geographic_info={"country": "Portugal"}, climate_info={},
+    )
+    degrade(monkeypatch, server.prepare_for_mongo(stored.dict(exclude={"degraded"})))
+    recommendation = generate("lisbon")
+    assert (recommendation.id, recommendation.created_at) == (stored.id, stored.created_at)
+    assert recommendation.recommendations == [{"name": "Belem Tower"}] and recommendation.degraded == "circuit_open"
+    assert server.write_queue.documents == []
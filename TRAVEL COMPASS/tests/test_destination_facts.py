@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+import recommendation_cache
+from destination_facts import DestinationFactsStore
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(recommendation_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_invalidation_reaches_other_workers_within_the_local_ttl(clock):
+    async def scenario():
+        collection = mongomock_motor.AsyncMongoMockClient()["test"]["destination_facts"]
+        worker_a = DestinationFactsStore(collection, local_ttl_seconds=60)
+        worker_b = DestinationFactsStore(collection, local_ttl_seconds=60)
+        facts = {"geographic_info": {"country": "France"}, "climate_info": {"best_time": "spring"}}
+
+        await worker_a.set("paris", **facts)
+        assert await worker_b.get("paris") == facts
+
+        await worker_a.invalidate("paris")
+        assert await worker_a.get("paris") is None
+        # Worker B keeps its copy for the local TTL only, not the 90 day shared TTL
+        assert await worker_b.get("paris") == facts
+        clock[0] += 61
+        assert await worker_b.get("paris") is None
+
+    asyncio.run(scenario())
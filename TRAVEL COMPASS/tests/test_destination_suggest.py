@@ -0,0 +1,71 @@
+import asyncio
+
+import server
+from destination_index import DestinationIndex
+
+
+class SlowHistory:
+    """travel_recommendations whose aggregate only answers once ``release`` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.pipelines = []
+
+    async def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        await self.release.wait()
+        yield {"_id": "Parisville", "count": 3}
+
+
+class FakeDatabase:
+    def __init__(self, history):
+        self.travel_recommendations = history
+
+
+def test_first_suggestion_does_not_wait_for_stored_counts(monkeypatch):
+    monkeypatch.setattr(server, "destination_index", DestinationIndex())
+    monkeypatch.setattr(server, "destination_names_loaded", False)
+    monkeypatch.setattr(server, "warmup_tasks", {})
+
+    async def scenario():
+        history = SlowHistory()
+        monkeypatch.setattr(server, "db", FakeDatabase(history))
+        first = await asyncio.wait_for(server.suggest_destinations(q="paris", limit=5), timeout=1)
+
+        history.release.set()
+        await server.warmup_tasks["destination_index"]
+        second = await server.suggest_destinations(q="paris", limit=5)
+        return history.pipelines, first, second
+
+    pipelines, first, second = asyncio.run(scenario())
+    assert "Paris" in [item["destination"] for item in first]
+    assert "Parisville" not in [item["destination"] for item in first]
+    assert "Parisville" in [item["destination"] for item in second]
+    assert {"$limit": server.DESTINATION_INDEX_MAX_STORED} in pipelines[0]
+    assert pipelines[0][0] == {"$match": {"fallback": {"$ne": True}}}
+
+
+class FakeQueue:
+    def __init__(self):
+        self.documents = []
+
+    async def put(self, collection, document):
+        self.documents.append(document)
+        return True
+
+
+def test_fallback_results_are_not_suggested(monkeypatch):
+    monkeypatch.setattr(server, "destination_index", DestinationIndex())
+    monkeypatch.setattr(server, "write_queue", FakeQueue())
+    monkeypatch.setattr(server, "warmup_tasks", {"destination_index": None})
+
+    def store(query, used_fallback):
+        recommendation = server.RecommendationResponse(query=query, recommendations=[], geographic_info={}, climate_info={})
+        cache_key, destination_key = server.make_cache_key(query)
+        asyncio.run(server.store_recommendation(recommendation, cache_key, destination_key, store_in_cache=False, used_fallback=used_fallback))
+
+    server.destination_index.add("Paris", canonical=True)
+    store("Pari", used_fallback=True)
+    store("Paris", used_fallback=False)
+    assert [item["destination"] for item in server.destination_index.suggest("pari", 5)] == ["Paris"]
+    assert len(server.write_queue.documents) == 2
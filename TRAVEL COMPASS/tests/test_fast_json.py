@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from fast_json import dumps, extract_json, loads
+
+RECOMMENDATION = {
+    "recommendations": [{"name": "Louvre", "rating": "4.5/5"}],
+    "geographic_info": {"country": "France"},
+    "climate_info": {"climate_type": "Oceanic"},
+}
+BODY = json.dumps(RECOMMENDATION)
+
+
+@pytest.mark.parametrize("text", [
+    BODY,
+    f"```json\n{BODY}\n```",
+    f"Here you go!\n\n{BODY}\n\nEnjoy {{your}} trip.",
+    f"Planning for {{destination}}:\n{BODY}",
+    json.dumps(RECOMMENDATION, indent=2),
+])
+def test_extract_json_finds_the_object(text):
+    assert extract_json(text) == (RECOMMENDATION, False)
+
+
+def test_extract_json_repairs_truncated_output():
+    value, repaired = extract_json(BODY[:BODY.index('"climate_info"') + 20])
+    assert repaired
+    assert value["recommendations"] == RECOMMENDATION["recommendations"]
+    assert value["geographic_info"] == {"country": "France"}
+
+
+def test_extract_json_truncated_without_repair():
+    assert extract_json(BODY[:-10], repair=False) == (None, False)
+
+
+@pytest.mark.parametrize("text", [
+    '{"recommendations":[{"name":"Louvre","rating":4.5/5}],"geographic_info":{"country":"France"},"climate_info":{}}',
+    '{"recommendations":[{"name":"Louvre",}],"geographic_info":{"country":"France"},}',
+])
+def test_extract_json_never_returns_a_nested_object_of_an_invalid_one(text):
+    assert extract_json(text) == (None, False)
+
+
+def test_extract_json_skips_invalid_object_to_a_later_one():
+    text = '{"draft": 4.5/5, "inner": {"x": 1}}\nFinal answer:\n' + BODY
+    assert extract_json(text) == (RECOMMENDATION, False)
+
+
+def test_extract_json_without_any_object():
+    assert extract_json("Sorry, I cannot help with that.") == (None, False)
+
+
+def test_dumps_round_trip():
+    assert loads(dumps(RECOMMENDATION)) == RECOMMENDATION
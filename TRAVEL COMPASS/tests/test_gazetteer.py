@@ -0,0 +1,33 @@
+import pytest
+
+from gazetteer import load_gazetteer, to_geographic_info
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return load_gazetteer()
+
+
+@pytest.mark.parametrize("destination, expected", [
+    ("Paris", ("Paris", "France")),
+    ("paris, france", ("Paris", "France")),
+    ("Santiago, Chile", ("Santiago", "Chile")),
+    ("New York, NY, USA", ("New York", "United States")),
+    ("Washington, D.C.", ("Washington", "United States")),
+    ("Edinburgh, Scotland", ("Edinburgh", "United Kingdom")),
+    ("London, UK", ("London", "United Kingdom")),
+])
+def test_lookup_resolves_names_aliases_and_hints(gazetteer, destination, expected):
+    record = gazetteer.lookup(destination)
+    assert (record["name"], record["country"]) == expected
+
+
+@pytest.mark.parametrize("destination", ["Paris, Texas", "Santiago, Spain", "Atlantis", ""])
+def test_lookup_does_not_guess_a_namesake(gazetteer, destination):
+    assert gazetteer.lookup(destination) is None
+
+
+def test_geographic_info_shape(gazetteer):
+    info = to_geographic_info(gazetteer.lookup("Kyoto"))
+    assert info["country"] == "Japan"
+    assert info["coordinates"].endswith("E")
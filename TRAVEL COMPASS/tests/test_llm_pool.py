@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from llm_pool import LlmClientPool, LlmPoolSaturated
+
+
+class SlowChat:
+    def __init__(self, session_id, release, sessions):
+        self.release = release
+        sessions.append(session_id)
+
+    async def send_message(self, message):
+        await self.release.wait()
+        return f"reply to {message}"
+
+
+def make_pool(release, sessions, **options):
+    return LlmClientPool(lambda session_id: SlowChat(session_id, release, sessions), **options)
+
+
+def test_calls_beyond_the_limit_queue_for_a_slot():
+    async def scenario():
+        release, sessions = asyncio.Event(), []
+        pool = make_pool(release, sessions, max_concurrency=2, max_queue=4)
+        calls = [asyncio.ensure_future(pool.send_message(f"m{index}")) for index in range(5)]
+        await asyncio.sleep(0.01)
+        busy = pool.stats()
+        release.set()
+        return busy, await asyncio.gather(*calls), pool.stats(), sessions
+
+    busy, replies, done, sessions = asyncio.run(scenario())
+    assert (busy["in_flight"], busy["waiting"]) == (2, 3)
+    assert replies == [f"reply to m{index}" for index in range(5)]
+    assert (done["in_flight"], done["waiting"], done["completed"], done["rejected"]) == (0, 0, 5, 0)
+    # Every call gets its own session
+    assert len(set(sessions)) == 5
+
+
+def test_full_queue_rejects_at_once():
+    async def scenario():
+        release, sessions = asyncio.Event(), []
+        pool = make_pool(release, sessions, max_concurrency=1, max_queue=2)
+        calls = [asyncio.ensure_future(pool.send_message(f"m{index}")) for index in range(3)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(LlmPoolSaturated, match="queue is full"):
+            await pool.send_message("one too many")
+        release.set()
+        await asyncio.gather(*calls)
+        return pool.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["completed"], stats["rejected"]) == (3, 1)
+
+
+def test_queue_timeout_rejects_waiting_callers():
+    async def scenario():
+        release, sessions = asyncio.Event(), []
+        pool = make_pool(release, sessions, max_concurrency=1, queue_timeout=0.02)
+        running = asyncio.ensure_future(pool.send_message("first"))
+        await asyncio.sleep(0)
+        with pytest.raises(LlmPoolSaturated, match="Timed out"):
+            await pool.send_message("second")
+        waiting = pool.waiting
+        release.set()
+        return waiting, await running, pool.stats()
+
+    waiting, reply, stats = asyncio.run(scenario())
+    assert waiting == 0 and reply == "reply to first"
+    assert (stats["completed"], stats["rejected"], stats["in_flight"]) == (1, 1, 0)
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+from metrics import MetricsMiddleware, MetricsRegistry
+
+
+def test_render_uses_the_prometheus_text_format():
+    registry = MetricsRegistry(prefix="app")
+    results = registry.counter("results_total", "Results by source", ["source"])
+    results.inc("cache")
+    results.inc("cache")
+    results.inc('l"l\nm')
+    sizes = registry.histogram("prompt_chars", "Prompt size", buckets=(100, 1000))
+    for value in (50, 100, 500, 5000):
+        sizes.observe(value)
+    registry.register_stats("pool", lambda: {"in_flight": 2, "state": "closed", "healthy": True, "wait": {"p50": 0.5}})
+
+    lines = registry.render().splitlines()
+    assert lines[lines.index("# TYPE app_results_total counter") + 1:][:2] == [
+        'app_results_total{source="cache"} 2',
+        'app_results_total{source="l\\"l\\nm"} 1',
+    ]
+    assert [line for line in lines if line.startswith("app_prompt_chars")] == [
+        'app_prompt_chars_bucket{le="100"} 2',
+        'app_prompt_chars_bucket{le="1000"} 3',
+        'app_prompt_chars_bucket{le="+Inf"} 4',
+        "app_prompt_chars_sum 5650",
+        "app_prompt_chars_count 4",
+    ]
+    # Numeric stats become gauges, strings and booleans are left out
+    assert [line for line in lines if line.startswith("app_pool")] == ["app_pool_in_flight 2", "app_pool_wait_p50 0.5"]
+
+
+def test_middleware_records_latency_and_server_timing():
+    registry = MetricsRegistry(prefix="app")
+    sent = []
+
+    async def app(scope, receive, send):
+        with registry.stage("lookup"):
+            pass
+        scope["route"] = SimpleNamespace(path="/api/items/{item_id}")
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = MetricsMiddleware(app, registry, server_timing=True)
+    asyncio.run(middleware({"type": "http", "method": "POST", "path": "/api/items/7"}, None, send))
+
+    timing = dict(sent[0]["headers"])[b"server-timing"].decode()
+    assert [part.split(";")[0] for part in timing.split(", ")] == ["lookup", "total"]
+    rendered = registry.render()
+    assert 'app_http_request_duration_seconds_count{method="POST",route="/api/items/{item_id}",status="201"} 1' in rendered
+    assert 'app_stage_duration_seconds_count{stage="lookup"} 1' in rendered
+    assert "app_http_requests_in_flight 0" in rendered
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import migrate_storage
+from recommendation_cache import make_cache_key
+from storage_codec import is_encoded
+
+
+@pytest.fixture
+def database(monkeypatch):
+    client = mongomock_motor.AsyncMongoMockClient()
+    client.close = lambda: None
+    monkeypatch.setattr(migrate_storage, "AsyncIOMotorClient", lambda url: client)
+    monkeypatch.setenv("DB_NAME", "test_migrate")
+    return client["test_migrate"]
+
+
+def make_config(*args):
+    return migrate_storage.build_parser().parse_args(["--batch-size", "2", *args])
+
+
+def test_destination_keys_are_backfilled_from_the_query(database):
+    async def scenario():
+        await database.travel_recommendations.insert_many([
+            {"id": "legacy-1", "query": "  Paris ", "created_at": "2024-01-01T00:00:00+00:00"},
+            {"id": "legacy-2", "query": "KYOTO", "created_at": "2024-01-02T00:00:00+00:00"},
+            {"id": "legacy-3", "query": "Oslo", "created_at": "2024-01-03T00:00:00+00:00"},
+            {"id": "current", "query": "Lisbon", "destination_key": "kept as is", "created_at": "2025-01-01T00:00:00+00:00"},
+        ])
+        dry_run = await migrate_storage.migrate(make_config("--destination-keys", "--dry-run"))
+        report = await migrate_storage.migrate(make_config("--destination-keys"))
+        rerun = await migrate_storage.migrate(make_config("--destination-keys"))
+        documents = await database.travel_recommendations.find({}, {"_id": 0, "id": 1, "destination_key": 1}).to_list(length=10)
+        return dry_run, report, rerun, {document["id"]: document["destination_key"] for document in documents}
+
+    dry_run, report, rerun, keys = asyncio.run(scenario())
+    assert (dry_run["documents"], dry_run["updated"]) == (3, 0)
+    assert (report["documents"], report["updated"]) == (3, 3)
+    assert rerun["documents"] == 0
+    assert keys == {
+        "legacy-1": make_cache_key("Paris")[1],
+        "legacy-2": make_cache_key("Kyoto")[1],
+        "legacy-3": make_cache_key("Oslo")[1],
+        "current": "kept as is",
+    }
+
+
+def test_documents_convert_to_compact_and_back(database):
+    documents = [
+        {
+            "id": f"rec-{index}",
+            "query": "Lisbon",
+            "created_at": f"2025-01-0{index + 1}T00:00:00+00:00",
+            "destination_key": "lisbon",
+            "recommendations": [{"name": "Alfama", "rank": index}],
+            "geographic_info": {"country": "Portugal"},
+            "climate_info": {"best_time": "spring"},
+        }
+        for index in range(5)
+    ]
+
+    async def stored():
+        return await database.travel_recommendations.find({}, {"_id": 0}).sort("id", 1).to_list(length=10)
+
+    async def scenario():
+        await database.travel_recommendations.insert_many([dict(document) for document in documents])
+        encoded = await migrate_storage.migrate(make_config("--codec", "zlib"))
+        compact = await stored()
+        rerun = await migrate_storage.migrate(make_config("--codec", "zlib"))
+        decoded = await migrate_storage.migrate(make_config("--decode"))
+        return encoded, compact, rerun, decoded, await stored()
+
+    encoded, compact, rerun, decoded, plain = asyncio.run(scenario())
+    assert (encoded["documents"], encoded["replaced"]) == (5, 5)
+    assert all(is_encoded(document) for document in compact)
+    assert rerun["documents"] == 0
+    assert (decoded["documents"], decoded["replaced"]) == (5, 5)
+    assert plain == documents
+
+
+def test_codec_defaults_to_zlib_when_the_app_stores_plain_documents(monkeypatch):
+    monkeypatch.setenv("STORAGE_CODEC", "none")
+    assert migrate_storage.build_parser().parse_args([]).codec == "zlib"
+    monkeypatch.setenv("STORAGE_CODEC", "zstd")
+    assert migrate_storage.build_parser().parse_args([]).codec == "zstd"
@@ -0,0 +1,37 @@
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+
+def test_next_cursor_is_url_safe_and_round_trips():
+    response = Response()
+    page = [{"created_at": "2026-10-17T01:54:34.316941+00:00", "id": "abc"}]
+    server.set_next_cursor(response, page, limit=1)
+    cursor = response.headers["X-Next-Cursor"]
+    assert cursor == "2026-10-17T01:54:34.316941Z,abc"
+    assert server.keyset_filter(cursor) == {"$or": [
+        {"created_at": {"$lt": "2026-10-17T01:54:34.316941+00:00"}},
+        {"created_at": "2026-10-17T01:54:34.316941+00:00", "id": {"$lt": "abc"}},
+    ]}
+
+
+@pytest.mark.parametrize("cursor", [
+    "2026-10-17T01:54:34.316941+00:00,abc",
+    "2026-10-17T01:54:34.316941 00:00,abc",
+    "2026-10-17T03:54:34.316941+02:00,abc",
+])
+def test_older_cursor_forms_are_still_accepted(cursor):
+    assert server.keyset_filter(cursor, "timestamp")["$or"][1] == {"timestamp": "2026-10-17T01:54:34.316941+00:00", "id": {"$lt": "abc"}}
+
+
+def test_no_cursor_on_a_short_page():
+    response = Response()
+    server.set_next_cursor(response, [{"created_at": "2026-10-17T01:54:34+00:00", "id": "abc"}], limit=2)
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_invalid_cursor_is_a_400():
+    with pytest.raises(HTTPException) as error:
+        server.keyset_filter("yesterday,abc")
+    assert error.value.status_code == 400
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from prewarm import DemandCounter, PrewarmScheduler, in_windows, parse_windows
+from recommendation_cache import make_cache_key
+
+
+def test_windows_may_wrap_midnight():
+    windows = parse_windows("22:00-02:00, 14:30-15:00")
+    at = lambda hour, minute=0: datetime(2026, 5, 1, hour, minute, tzinfo=timezone.utc)
+    assert in_windows(windows, at(23)) and in_windows(windows, at(1)) and in_windows(windows, at(14, 45))
+    assert not in_windows(windows, at(3)) and not in_windows(windows, at(15))
+    assert in_windows([], at(12))
+
+
+def test_every_served_request_counts_as_demand():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    collection = mongomock_motor.AsyncMongoMockClient()["test"]["query_demand"]
+
+    async def scenario():
+        demand = DemandCounter(collection, flush_interval=3600)
+        scheduler = PrewarmScheduler(demand, cache=None, warm=None, top_n=2)
+        # Lisbon is always served from cache: it never reaches history, but it is still the busiest
+        for _ in range(5):
+            demand.record(make_cache_key("Lisbon", "museums")[0], "Lisbon", "museums")
+        demand.record(make_cache_key("Lisbon", "Museums.")[0], "Lisbon", "Museums.")
+        for _ in range(3):
+            demand.record(make_cache_key("Kyoto")[0], "Kyoto", None)
+        demand.record(make_cache_key("Oslo")[0], "Oslo", None)
+        first = await scheduler.top_queries()
+
+        for _ in range(4):
+            demand.record(make_cache_key("Kyoto")[0], "Kyoto", None)
+        second = await scheduler.top_queries()
+        await demand.stop()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert [(target["destination"], target["requests"]) for target in first] == [("Lisbon", 6), ("Kyoto", 3)]
+    assert first[0]["cache_key"] == make_cache_key("Lisbon", "museums")[0]
+    assert first[0]["destination_key"] == make_cache_key("Lisbon")[1]
+    assert [(target["destination"], target["requests"]) for target in second] == [("Kyoto", 7), ("Lisbon", 6)]
+
+
+def test_demand_outside_the_lookback_is_ignored():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    collection = mongomock_motor.AsyncMongoMockClient()["test"]["query_demand"]
+
+    async def scenario():
+        old_day = (datetime.now(timezone.utc) - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+        await collection.insert_one({
+            "_id": "old", "cache_key": "old", "query": "Rome", "preferences": None, "day": old_day, "requests": 100,
+        })
+        demand = DemandCounter(collection)
+        demand.record(make_cache_key("Oslo")[0], "Oslo", None)
+        return await PrewarmScheduler(demand, cache=None, warm=None, lookback_days=7).top_queries()
+
+    assert [target["destination"] for target in asyncio.run(scenario())] == ["Oslo"]
+
+
+class FakeCache:
+    async def expiries(self, cache_keys):
+        return {}
+
+
+def test_workers_share_each_key_through_a_lease():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    database = mongomock_motor.AsyncMongoMockClient()["test"]
+    warmed = []
+
+    async def warm(destination, preferences):
+        warmed.append(destination)
+        await asyncio.sleep(0.01)
+        return True
+
+    async def scenario():
+        demand = DemandCounter(database["query_demand"], flush_interval=3600)
+        for destination in ("Lisbon", "Kyoto", "Oslo"):
+            demand.record(make_cache_key(destination)[0], destination, None)
+        await demand.flush()
+        workers = [PrewarmScheduler(demand, FakeCache(), warm, leases=database["prewarm_leases"]) for _ in range(3)]
+        summaries = await asyncio.gather(*(worker.run(force=True) for worker in workers))
+        await demand.stop()
+        return summaries
+
+    summaries = asyncio.run(scenario())
+    assert sorted(warmed) == ["Kyoto", "Lisbon", "Oslo"]
+    assert sum(summary["prewarmed"] for summary in summaries) == 3
+    assert sum(summary["leased_elsewhere"] for summary in summaries) == 6
+
+
+class FailingCollection:
+    def __init__(self):
+        self.fail = True
+        self.updates = []
+
+    async def update_one(self, query, update, upsert=False):
+        if self.fail:
+            raise ConnectionError("primary stepped down")
+        self.updates.append((query["_id"], update["$inc"]["requests"]))
+
+
+def test_failed_flush_keeps_the_counts():
+    collection = FailingCollection()
+
+    async def scenario():
+        demand = DemandCounter(collection, flush_interval=3600)
+        for _ in range(2):
+            demand.record(make_cache_key("Lisbon")[0], "Lisbon", None)
+        await demand.flush()
+        demand.record(make_cache_key("Lisbon")[0], "Lisbon", None)
+        failures = demand.stats()["flush_failures"]
+        collection.fail = False
+        await demand.stop()
+        return failures
+
+    assert asyncio.run(scenario()) == 1
+    assert [requests for _, requests in collection.updates] == [3]
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import recommendation_cache
+from recommendation_cache import RecommendationCache, make_cache_key
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(recommendation_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_make_cache_key_ignores_case_punctuation_and_whitespace():
+    assert make_cache_key("  Paris, France ", "Museums and food") == make_cache_key("paris france", "museums, AND  food!")
+    assert make_cache_key("Paris", "food") != make_cache_key("Paris", "museums")
+
+
+def test_make_cache_key_keeps_word_order():
+    assert make_cache_key("Paris", "avoid museums, love food") != make_cache_key("Paris", "love museums, avoid food")
+
+
+def test_invalidation_reaches_other_workers_within_the_local_ttl(clock):
+    async def scenario():
+        collection = mongomock_motor.AsyncMongoMockClient()["test"]["recommendation_cache"]
+        worker_a = RecommendationCache(collection, local_ttl_seconds=30)
+        worker_b = RecommendationCache(collection, local_ttl_seconds=30)
+        key, destination_key = make_cache_key("Paris")
+
+        await worker_a.set(key, destination_key, {"query": "Paris"})
+        assert await worker_b.get(key) == {"query": "Paris"}
+
+        await worker_a.invalidate(destination_key)
+        assert await worker_a.get(key) is None
+        # Worker B still holds its in-process copy, but only until the local TTL runs out
+        assert await worker_b.get(key) == {"query": "Paris"}
+        clock[0] += 31
+        assert await worker_b.get(key) is None
+
+    asyncio.run(scenario())
+
+
+def test_cached_keys_does_not_count_a_lookup(clock):
+    async def scenario():
+        collection = mongomock_motor.AsyncMongoMockClient()["test"]["recommendation_cache"]
+        writer, reader = RecommendationCache(collection), RecommendationCache(collection)
+        key, destination_key = make_cache_key("Rome")
+        other = make_cache_key("Oslo")[0]
+        assert await reader.cached_keys([key, other]) == set()
+        await writer.set(key, destination_key, {"query": "Rome"})
+        assert await reader.cached_keys([key, other]) == {key}
+        assert (reader.local_hits, reader.remote_hits, reader.misses) == (0, 0, 0)
+        assert await reader.get(key) == {"query": "Rome"}
+        assert reader.local_hits == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from llm_pool import LlmClientPool, LlmPoolSaturated
+from resilience import CircuitBreaker, LlmDeadlineExceeded, ResilientCaller
+
+
+class SlowChat:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.delay)
+        return f"reply to {message}"
+
+
+def make_caller(delay, deadline=0.1, queue_timeout=1.0):
+    pool = LlmClientPool(lambda session_id: SlowChat(delay), max_concurrency=1, queue_timeout=queue_timeout)
+    breaker = CircuitBreaker(failure_threshold=1)
+    caller = ResilientCaller(pool.send, breaker, deadline=deadline, hedge=False, passthrough=(LlmPoolSaturated,), slot=pool.slot)
+    return pool, breaker, caller
+
+
+def test_queue_wait_does_not_count_against_the_deadline():
+    pool, breaker, caller = make_caller(delay=0.05)
+
+    async def scenario():
+        async with pool.slot():
+            call = asyncio.ensure_future(caller("hello"))
+            # Queued for longer than the whole deadline
+            await asyncio.sleep(0.2)
+        return await call
+
+    assert asyncio.run(scenario()) == "reply to hello"
+    assert breaker.stats()["state"] == "closed" and caller.stats()["failures"] == 0
+
+
+def test_queue_timeout_is_backpressure_not_a_provider_failure():
+    pool, breaker, caller = make_caller(delay=0.05, queue_timeout=0.05)
+
+    async def scenario():
+        async with pool.slot():
+            with pytest.raises(LlmPoolSaturated):
+                await caller("hello")
+
+    asyncio.run(scenario())
+    assert breaker.stats()["state"] == "closed" and breaker.consecutive_failures == 0
+    assert caller.stats()["failures"] == 0
+
+
+def test_slow_provider_exceeds_the_deadline_and_opens_the_breaker():
+    pool, breaker, caller = make_caller(delay=1.0)
+
+    with pytest.raises(LlmDeadlineExceeded):
+        asyncio.run(caller("hello"))
+    assert breaker.stats()["state"] == "open"
+    assert caller.stats()["deadline_exceeded"] == 1
+    assert pool.stats()["in_flight"] == 0
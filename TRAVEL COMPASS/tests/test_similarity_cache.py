@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from similarity_cache import SimilarityCache, analyze
+
+# Labelled preference pairs: "same" when one stored answer serves both requests
+PAIRS = json.loads((Path(__file__).parent / "data" / "preference_pairs.json").read_text())
+
+
+# Other stored requests for the same city, none equivalent to any labelled preference.
+# They shift document frequencies the way a busy cache does
+BACKGROUND = [
+    "jazz concerts", "parks and gardens", "day trips to castles", "cooking classes",
+    "bike tours", "opera and ballet", "rooftop views", "cathedrals",
+]
+
+
+def crowded_cache(stored, **options):
+    cache = SimilarityCache(**options)
+    for index, preferences in enumerate(BACKGROUND):
+        cache.add(f"other-{index}", "paris, france", preferences)
+    cache.add("rec", "paris, france", stored)
+    return cache
+
+
+def score(stored, query):
+    match = crowded_cache(stored, threshold=-1.0).lookup("paris, france", query)
+    return match[1] if match and match[0] == "rec" else -1.0
+
+
+def test_default_threshold_separates_labelled_pairs():
+    threshold = SimilarityCache().threshold
+    scores = [(pair["same"], min(score(pair["a"], pair["b"]), score(pair["b"], pair["a"]))) for pair in PAIRS]
+    positives = [value for same, value in scores if same]
+    negatives = [value for same, value in scores if not same]
+    assert max(negatives) < threshold <= min(positives)
+    # Keep a margin on both sides so small vocabulary changes do not flip pairs
+    assert min(positives) - threshold >= 0.05 and threshold - max(negatives) >= 0.05
+
+
+@pytest.mark.parametrize("pair", [pair for pair in PAIRS if not pair["same"]], ids=lambda pair: f"{pair['a']} / {pair['b']}")
+def test_different_requests_miss(pair):
+    for cache in (SimilarityCache(), crowded_cache(pair["a"])):
+        cache.add("rec", "lisbon, portugal", pair["a"])
+        assert cache.lookup("lisbon, portugal", pair["b"]) is None
+        assert cache.lookup("paris, france", pair["b"]) is None
+
+
+@pytest.mark.parametrize("pair", [pair for pair in PAIRS if pair["same"]], ids=lambda pair: f"{pair['a']} / {pair['b']}")
+def test_equivalent_requests_hit(pair):
+    cache = SimilarityCache()
+    cache.add("rec", "lisbon, portugal", pair["a"])
+    assert cache.lookup("lisbon, portugal", pair["b"])[0] == "rec"
+    assert crowded_cache(pair["a"]).lookup("paris, france", pair["b"])[0] == "rec"
+
+
+def test_terms_on_one_side_only_block_a_match():
+    cache = crowded_cache("museums and cheap food")
+    for index, preferences in enumerate(["budget backpacking", "nightlife and street food", "family friendly, beaches"]):
+        cache.add(f"stored-{index}", "paris, france", preferences)
+    queries = ["luxury backpacking", "museums and luxury food", "nightlife and fine dining", "family friendly, nightlife"]
+    assert cache.lookup_many([("paris, france", query) for query in queries]) == [None] * len(queries)
+    assert cache.lookup("paris, france", "cheap eats and museums")[0] == "rec"
+
+
+def test_negation_is_part_of_the_signature():
+    assert analyze("non-vegetarian food") == (["!vegetarian", "food"], "vegetarian")
+    assert analyze("I don't want museums") == (["!museum"], "museum")
+    assert analyze("hiking with kids") == (["hike", "kid"], "")
+
+
+def test_lookup_is_scoped_to_the_destination():
+    cache = SimilarityCache()
+    cache.add("rec", "lisbon, portugal", "museums")
+    assert cache.lookup("porto, portugal", "museums") is None
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", fetch) for _ in range(5)))
+        return flights, results
+
+    flights, results = asyncio.run(scenario())
+    assert results == ["result"] * 5 and len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 4, "follower_timeouts": 0}
+
+
+def test_follower_timeout_leaves_the_leader_running():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "result"
+
+        flights = SingleFlight()
+        leader = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flights.do("key", fetch, follower_timeout=0.01)
+        release.set()
+        return flights, await leader
+
+    flights, result = asyncio.run(scenario())
+    assert result == "result"
+    assert flights.stats()["follower_timeouts"] == 1 and len(flights) == 0
+
+
+def test_cancelled_leader_leaves_followers_their_result():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "result"
+
+        flights = SingleFlight()
+        leader = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "result"
+
+
+def test_shared_call_is_cancelled_once_every_caller_gives_up():
+    cancelled = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        flights = SingleFlight()
+        callers = [asyncio.ensure_future(flights.do("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        callers[0].cancel()
+        await asyncio.sleep(0)
+        assert not cancelled
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flights
+
+    flights = asyncio.run(scenario())
+    assert cancelled == [1] and len(flights) == 0
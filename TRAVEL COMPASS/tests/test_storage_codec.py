@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from storage_codec import RecommendationCodec, is_encoded, make_facts_ref
+
+FACTS = {
+    "geographic_info": {"country": "Portugal", "region": "Lisbon"},
+    "climate_info": {"best_time": "spring"},
+}
+
+
+def make_document(index, facts=FACTS):
+    return {
+        "id": f"rec-{index}",
+        "query": "Lisbon",
+        "created_at": f"2025-01-0{index + 1}T00:00:00+00:00",
+        "destination_key": "lisbon",
+        "preferences": None,
+        "fallback": False,
+        "recommendations": [{"name": "Belem Tower", "rank": index}, {"name": "Alfama"}],
+        **facts,
+    }
+
+
+def facts_collection():
+    return mongomock_motor.AsyncMongoMockClient()["test"]["recommendation_facts"]
+
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_documents_round_trip(codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    documents = [make_document(index) for index in range(3)]
+
+    async def scenario():
+        collection = facts_collection()
+        encoded = await RecommendationCodec(collection, codec=codec).encode_many(documents)
+        # A fresh codec has nothing cached, so facts come back from the collection
+        decoded = await RecommendationCodec(collection, codec=codec).decode_many(encoded)
+        return encoded, decoded, await collection.count_documents({})
+
+    encoded, decoded, facts_stored = asyncio.run(scenario())
+    assert all(is_encoded(document) and "recommendations" not in document for document in encoded)
+    assert encoded[0]["facts_ref"] == make_facts_ref(FACTS) and encoded[0]["country"] == "Portugal"
+    assert encoded[0]["recommendation_count"] == 2
+    assert decoded == documents
+    assert facts_stored == 1
+
+
+def test_plain_and_encoded_documents_decode_together():
+    plain = make_document(0)
+
+    async def scenario():
+        codec = RecommendationCodec(facts_collection())
+        encoded = (await codec.encode_many([make_document(1)]))[0]
+        return await codec.decode_many([plain, encoded]), await codec.decode(None)
+
+    decoded, missing = asyncio.run(scenario())
+    assert decoded == [plain, make_document(1)]
+    assert missing is None
+
+
+def test_codec_none_writes_plain_documents():
+    documents = [make_document(0)]
+    codec = RecommendationCodec(facts_collection(), codec="none")
+    assert asyncio.run(codec.encode_many(documents)) == documents
+
+
+class FailingFacts:
+    async def update_one(self, query, update, upsert=False):
+        raise ConnectionError("facts collection unavailable")
+
+
+def test_facts_stay_inline_when_they_cannot_be_stored():
+    codec = RecommendationCodec(FailingFacts())
+    encoded = asyncio.run(codec.encode_many([make_document(0)]))[0]
+    assert encoded["facts_ref"] is None
+    assert asyncio.run(codec.decode(encoded)) == make_document(0)
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from streaming_json import RecommendationStreamParser
+
+RECOMMENDATION = {
+    "recommendations": [
+        {"name": "Louvre", "tips": "Closed {Tuesdays}, \"book\" ahead"},
+        {"name": "Seine cruise", "nested": {"deck": [1, 2]}},
+    ],
+    "geographic_info": {"country": "France", "coordinates": "48.85 N"},
+    "climate_info": {"seasons": {"summer": "warm"}},
+}
+EXPECTED = [
+    ("recommendation", RECOMMENDATION["recommendations"][0]),
+    ("recommendation", RECOMMENDATION["recommendations"][1]),
+    ("geographic_info", RECOMMENDATION["geographic_info"]),
+    ("climate_info", RECOMMENDATION["climate_info"]),
+]
+
+
+def feed_all(text, size):
+    parser = RecommendationStreamParser()
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return parser, events
+
+
+@pytest.mark.parametrize("size", [1, 3, 64, 10000])
+def test_events_do_not_depend_on_chunking(size):
+    parser, events = feed_all(json.dumps(RECOMMENDATION), size)
+    assert events == EXPECTED
+    assert parser.done
+
+
+def test_preamble_fence_and_postscript_are_ignored():
+    text = "Sure!\n```json\n" + json.dumps(RECOMMENDATION, indent=2) + "\n```\nMore {braces} here."
+    parser, events = feed_all(text, 7)
+    assert events == EXPECTED
+    assert parser.text() == text
+
+
+def test_truncated_stream_emits_only_closed_values():
+    text = json.dumps(RECOMMENDATION)
+    parser, events = feed_all(text[:text.index('"geographic_info"') + 30], 5)
+    assert events == EXPECTED[:2]
+    assert not parser.done
+
+
+def test_invalid_item_is_skipped():
+    text = '{"recommendations": [{"name": "A", "rating": 4.5/5}, {"name": "B"}]}'
+    assert feed_all(text, 4)[1] == [("recommendation", {"name": "B"})]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from write_behind import WriteBehindQueue
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_database():
+    return mongomock_motor.AsyncMongoMockClient()["test"]
+
+
+def test_queued_writes_are_batched_and_flushed():
+    async def scenario():
+        database = make_database()
+        queue = WriteBehindQueue(database, batch_size=10, flush_interval=0.01)
+        for i in range(25):
+            assert queue.enqueue("status_checks", {"id": i})
+        queue.enqueue("travel_recommendations", {"id": "rec"})
+        await queue.flush()
+        counts = (await database.status_checks.count_documents({}), await database.travel_recommendations.count_documents({}))
+        await queue.stop()
+        return counts, queue.stats()
+
+    counts, stats = asyncio.run(scenario())
+    assert counts == (25, 1)
+    assert (stats["enqueued"], stats["written"], stats["dropped"], stats["queue_depth"]) == (26, 26, 0, 0)
+    assert stats["batches"] >= 3
+
+
+def test_full_queue_drops_instead_of_blocking():
+    async def scenario():
+        database = make_database()
+        queue = WriteBehindQueue(database, max_queue=2)
+        accepted = [queue.enqueue("status_checks", {"id": i}) for i in range(4)]
+        await queue.stop()
+        return accepted, await database.status_checks.count_documents({}), queue.stats()
+
+    accepted, stored, stats = asyncio.run(scenario())
+    assert accepted == [True, True, False, False]
+    assert stored == 2 and stats["dropped"] == 2
+
+
+def test_prepare_failure_does_not_stop_the_worker():
+    def prepare(document):
+        if document.get("broken"):
+            raise ValueError("cannot prepare")
+        return document
+
+    async def scenario():
+        database = make_database()
+        queue = WriteBehindQueue(database, prepare=prepare, flush_interval=0.01)
+        queue.enqueue("status_checks", {"id": 1, "broken": True})
+        queue.enqueue("status_checks", {"id": 2})
+        await asyncio.wait_for(queue.flush(), timeout=1)
+        queue.enqueue("status_checks", {"id": 3})
+        await asyncio.wait_for(queue.flush(), timeout=1)
+        ids = sorted([doc["id"] async for doc in database.status_checks.find()])
+        await queue.stop()
+        return ids, queue.stats()
+
+    ids, stats = asyncio.run(scenario())
+    assert ids == [2, 3]
+    assert (stats["written"], stats["failed"]) == (2, 1)
+
+
+def test_inline_put_writes_before_returning():
+    async def scenario():
+        database = make_database()
+        queue = WriteBehindQueue(database, inline=True)
+        await queue.put("status_checks", {"id": 1})
+        # Nothing is left in memory for a shutdown hook that may never run
+        return await database.status_checks.count_documents({}), queue.stats()
+
+    stored, stats = asyncio.run(scenario())
+    assert stored == 1
+    assert (stats["queue_depth"], stats["written"], stats["inline"]) == (0, 1, True)